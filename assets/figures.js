@@ -0,0 +1,36 @@
+// Unfiltered figures come from the pre-rendered bundle: a plain GET the
+// browser caches for good, since bundle files are named by content hash.
+// Filtered views are left to the server callbacks.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        section: function (...args) {
+            const bundle = args.pop();
+            const outputs = window.dash_clientside.callback_context.outputs_list;
+            if (isFiltered(args)) {
+                return outputs.map(() => window.dash_clientside.no_update);
+            }
+            return Promise.all(outputs.map((output) => fetchFigure(bundle[output.id])));
+        },
+        trends: function (selected, ...args) {
+            const bundle = args.pop();
+            if (isFiltered(args)) {
+                return window.dash_clientside.no_update;
+            }
+            return fetchFigure(bundle["trend:" + selected]).then((figures) =>
+                figures.map((figure) => ({
+                    namespace: "dash_core_components",
+                    type: "Graph",
+                    props: {figure: figure},
+                }))
+            );
+        },
+    },
+});
+
+function isFiltered(filters) {
+    return filters.some((value) => (Array.isArray(value) ? value.length : value));
+}
+
+function fetchFigure(url) {
+    return fetch(url).then((response) => response.json());
+}
@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+TEMPLATE_PATH = "assets/cleaned_dataset.csv"
+GENERATE_CHUNK = 1_000_000
+DUPLICATE_RATE = 0.01
+
+trend_values = ["monthly-by-year", "monthly", "yearly", "region_country"]
+
+# What a fresh gunicorn worker does before it can answer: import the app,
+# then serve the page and its layout.
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+import wsgi
+client = wsgi.server.test_client()
+client.get("/")
+client.get("/_dash-layout")
+print(time.perf_counter() - start)
+"""
+IMPORT_MIN_SECONDS = 0.01
+
+
+def generate_dataset(rows, path, seed=0, template=TEMPLATE_PATH):
+    # Synthetic orders with the columns of assets/cleaned_dataset.csv. Region,
+    # Country and the per-item prices are drawn from the real data; dates are
+    # written in the raw source format so cleaning.py parses them unchanged.
+    base = pd.read_csv(template)
+    places = base[["Region", "Country"]].drop_duplicates().to_numpy()
+    items = base.groupby("Item Type")[["Unit Price", "Unit Cost"]].first()
+    item_names = items.index.to_numpy()
+    priorities = np.array(["C", "H", "M", "L"])
+    channels = np.array(["Online", "Offline"])
+    first_day = pd.Timestamp("2010-01-01")
+    span = (pd.Timestamp("2017-07-28") - first_day).days
+
+    rng = np.random.default_rng(seed)
+    order_ids = 100_000_000 + rng.permutation(rows).astype(np.int64) * 7
+    order_ids += rng.integers(0, 7, rows)
+    dupes = rng.random(rows) < DUPLICATE_RATE
+    order_ids[dupes] = order_ids[rng.integers(0, rows, dupes.sum())]
+
+    header = True
+    for start in range(0, rows, GENERATE_CHUNK):
+        n = min(GENERATE_CHUNK, rows - start)
+        place = places[rng.integers(0, len(places), n)]
+        item = rng.integers(0, len(item_names), n)
+        units = rng.integers(1, 10_001, n)
+        price = items["Unit Price"].to_numpy()[item]
+        cost = items["Unit Cost"].to_numpy()[item]
+        order_date = first_day + pd.to_timedelta(rng.integers(0, span, n), unit="D")
+        shipping = rng.integers(0, 51, n)
+        revenue = np.round(units * price, 2)
+        total_cost = np.round(units * cost, 2)
+        chunk = pd.DataFrame(
+            {
+                "Region": place[:, 0],
+                "Country": place[:, 1],
+                "Item Type": item_names[item],
+                "Sales Channel": channels[rng.integers(0, 2, n)],
+                "Order Priority": priorities[rng.integers(0, 4, n)],
+                "Order Date": order_date.strftime("%m/%d/%Y"),
+                "Order ID": order_ids[start : start + n],
+                "Ship Date": (
+                    order_date + pd.to_timedelta(shipping, unit="D")
+                ).strftime("%m/%d/%Y"),
+                "Units Sold": units,
+                "Unit Price": price,
+                "Unit Cost": cost,
+                "Total Revenue": revenue,
+                "Total Cost": total_cost,
+                "Total Profit": np.round(revenue - total_cost, 2),
+                "Shipping Time (days)": shipping,
+                "Average Order Value (AOV)": revenue / rows,
+                "Profit Margin": (revenue - total_cost) / revenue * 100,
+            }
+        )
+        chunk.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+
+class Recorder:
+    def __init__(self, rows):
+        self.rows = rows
+        self.results = []
+
+    @contextmanager
+    def stage(self, name):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.results.append(
+                {
+                    "rows": self.rows,
+                    "stage": name,
+                    "seconds": round(seconds, 6),
+                    "peak_mb": round(peak / 2**20, 3),
+                }
+            )
+
+    def frame_size(self, frame):
+        # Recorded next to the stage that built the frame, so peak_mb can be
+        # read as a number of copies of the data held at once.
+        self.results[-1]["frame_mb"] = round(
+            frame.memory_usage(deep=True).sum() / 2**20, 3
+        )
+
+
+def run_stages(path, rows):
+    # Runs in a fresh interpreter per dataset size: eda.py builds its module
+    # state from EDA_SOURCE once at import.
+    import cleaning
+    from cube import SalesCube
+    from store import load_store
+
+    rec = Recorder(rows)
+
+    with rec.stage("csv_load"):
+        df = pd.read_csv(path)
+    rec.frame_size(df)
+    with rec.stage("date_parse"):
+        for col in cleaning.date_cols:
+            df[col] = cleaning.parse_days(df[col], cleaning.DATE_FORMAT)
+    with rec.stage("dedup"):
+        df = df.drop_duplicates(subset="Order ID")
+    with rec.stage("zscore_filter"):
+        profit = df["Total Profit"]
+        df = df[np.abs((profit - profit.mean()) / profit.std(ddof=0)) < 3]
+    del df, profit
+
+    with rec.stage("clean_pipeline"):
+        cdf = cleaning.load_clean_data(path)
+    rec.frame_size(cdf)
+    del cdf
+    with rec.stage("store_cold"):
+        store = load_store(path)
+    del store
+    with rec.stage("store_warm"):
+        cdf = load_store(path).data
+    with rec.stage("cube_build"):
+        SalesCube.from_frame(cdf)
+    del cdf
+
+    with rec.stage("eda_import"):
+        import eda
+
+    for func in (
+        eda.calculate_sales_metrics,
+        eda.regional_and_country_performance,
+        eda.product_and_sales_channel_insights,
+        eda.order_and_shipping_efficiency,
+    ):
+        with rec.stage(func.__name__):
+            func(eda.cube)
+
+    for name in eda.figures.builders:
+        with rec.stage(f"figure:{name}"):
+            eda.figures.build(name, eda.no_filter)
+
+    for value in trend_values:
+        with rec.stage(f"update_sales_trend:{value}"):
+            eda.sales_trend_figures.__wrapped__(value, eda.no_filter)
+
+    return rec.results
+
+
+def startup_times(rows, env):
+    # Runs FIRST_REQUEST under -X importtime in a fresh interpreter, against
+    # the caches run_stages left warm. Reports the time to the first served
+    # request and the cumulative import time of the app's modules and of
+    # everything eda imports directly.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", FIRST_REQUEST],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return [{"rows": rows, "stage": "error", "error": proc.stderr[-2000:]}]
+    results = [
+        {
+            "rows": rows,
+            "stage": "startup:first_request",
+            "seconds": round(float(proc.stdout.split()[-1]), 6),
+        }
+    ]
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        seconds = int(cumulative) / 1e6
+        # Nested imports are indented two spaces under the module that
+        # pulled them in; wsgi imports eda, and eda's own imports are the
+        # level below that.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 2 and seconds >= IMPORT_MIN_SECONDS:
+            results.append(
+                {"rows": rows, "stage": f"import:{name.strip()}", "seconds": seconds}
+            )
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(label, rows, workdir, keep_data, startup=False):
+    data = os.path.join(workdir, f"sales-{label}.csv")
+    if not os.path.exists(data):
+        generate_dataset(rows, data)
+    env = dict(
+        os.environ,
+        EDA_SOURCE=data,
+        EDA_STORE_DIR=os.path.join(workdir, f"store-{label}"),
+    )
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", data, "--rows", str(rows)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    results = []
+    if proc.returncode != 0:
+        results.append({"rows": rows, "stage": "error", "error": proc.stderr[-2000:]})
+    else:
+        results += json.loads(proc.stdout)
+        if startup:
+            results += startup_times(rows, env)
+    if not keep_data:
+        os.remove(data)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and measure peak memory of each eda.py stage."
+    )
+    parser.add_argument(
+        "--sizes", default="10k,1m", help=f"comma-separated, from {list(SIZES)}"
+    )
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--workdir", help="keep generated data in this directory")
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="also time a fresh worker's imports and first request",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="with --startup, exit with status 1 if a first request takes "
+        "longer than this many seconds",
+    )
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(run_stages(args.worker, args.rows), sys.stdout)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="eda-bench-")
+    results = []
+    for label in args.sizes.split(","):
+        results += run_size(
+            label, SIZES[label], workdir, bool(args.workdir), args.startup
+        )
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+    if args.budget is not None:
+        over = [
+            result
+            for result in results
+            if result["stage"] == "startup:first_request"
+            and result["seconds"] > args.budget
+        ]
+        for result in over:
+            print(
+                f"{result['rows']:,} rows: first request after "
+                f"{result['seconds']:.2f}s, over the {args.budget:.2f}s budget",
+                file=sys.stderr,
+            )
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
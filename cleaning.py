@@ -0,0 +1,300 @@
+import io
+import os
+from contextlib import nullcontext
+
+import pandas as pd
+import numpy as np
+
+from dates import calendar, day_dates, parse_days
+from parallel import PROCESSES, map_chunks, process_pool
+from schema import SCHEMA, apply_schema, concat_chunks, date_cols
+from sketches import KLLSketch, weighted_quantile
+
+SOURCE_PATH = os.environ.get("EDA_SOURCE", "assets/Amazon Sales data.csv")
+CLEANED_PATH = "assets/cleaned_dataset.csv"
+
+DATE_FORMAT = "%m/%d/%Y"
+CHUNKSIZE = 500_000
+Z_THRESHOLD = 3
+
+# Outlier rule per column: (mode, threshold). "zscore" drops |z| >= threshold;
+# "mad" drops values threshold or more scaled MADs from the median; "iqr"
+# drops values outside [Q1 - threshold * IQR, Q3 + threshold * IQR].
+OUTLIER_RULES = {"Total Profit": ("zscore", Z_THRESHOLD)}
+
+
+def cleaning_settings(outlier_rules=None):
+    # Everything besides the source file that decides which rows survive
+    # cleaning, in the JSON form cached artifacts record and compare.
+    rules = outlier_rules or OUTLIER_RULES
+    return {"outlier_rules": {col: list(rule) for col, rule in sorted(rules.items())}}
+
+
+class OrderIdFilter:
+    # Exact "keep first" dedup across chunks. Order IDs are bounded integers,
+    # so a bitmap over the ID range costs at most ~125 MB for 9-digit IDs
+    # however many rows are streamed through it.
+    def __init__(self, bits=None):
+        self.bits = np.zeros(0, dtype=np.uint8) if bits is None else bits
+
+    def first_seen(self, order_ids):
+        ids = order_ids.to_numpy(dtype=np.int64)
+        if len(ids) and ids.min() < 0:
+            raise ValueError("Order ID must be a non-negative integer")
+        mask = ~order_ids.duplicated().to_numpy()
+        if not len(ids):
+            return mask
+        needed = int(ids.max() >> 3) + 1
+        if needed > len(self.bits):
+            # IDs are usually spread over the whole range from the first
+            # chunk on, so grow by a little rather than doubling a bitmap
+            # that may already be 100 MB.
+            grown = np.zeros(max(needed, len(self.bits) * 9 // 8), dtype=np.uint8)
+            grown[: len(self.bits)] = self.bits
+            self.bits = grown
+        byte, bit = ids >> 3, (1 << (ids & 7)).astype(np.uint8)
+        mask &= (self.bits[byte] & bit) == 0
+        np.bitwise_or.at(self.bits, byte[mask], bit[mask])
+        return mask
+
+
+class OutlierBounds:
+    # Streaming statistics behind one column's outlier rule. Mean and M2 are
+    # merged chunk by chunk (Welford's update, batched as in Chan et al.);
+    # the robust modes also feed a KLL quantile sketch, so the median, MAD
+    # and quartiles come from O(k) memory rather than the whole column.
+    modes = ("zscore", "mad", "iqr")
+
+    def __init__(self, mode="zscore", threshold=Z_THRESHOLD):
+        if mode not in self.modes:
+            raise ValueError(f"outlier mode must be one of {self.modes}")
+        self.mode = mode
+        self.threshold = threshold
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = None if mode == "zscore" else KLLSketch()
+
+    def update(self, values):
+        values = values.astype(float).dropna().to_numpy()
+        if not len(values):
+            return
+        if self.sketch is not None:
+            self.sketch.update(values)
+        n, mean = len(values), values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+
+    def std(self):
+        return np.sqrt(self.m2 / self.n)
+
+    def keep(self, values):
+        if self.mode == "zscore":
+            return np.abs((values - self.mean) / self.std()) < self.threshold
+        if self.mode == "mad":
+            items, weights = self.sketch.weighted()
+            median = weighted_quantile(items, weights, 0.5)
+            # 1.4826 scales the MAD to the standard deviation of a normal.
+            mad = 1.4826 * weighted_quantile(np.abs(items - median), weights, 0.5)
+            distance = np.abs(values - median)
+            return (distance < self.threshold * mad) | (distance == 0)
+        q1, q3 = self.sketch.quantile(0.25), self.sketch.quantile(0.75)
+        fence = self.threshold * (q3 - q1)
+        return (values >= q1 - fence) & (values <= q3 + fence)
+
+
+class ColumnStatistics:
+    # Everything the cleaning pass needs from the deduplicated rows: value
+    # counts for the median/mode fills and the outlier bounds per column.
+    def __init__(self, outlier_rules=None):
+        self.units_counts = pd.Series(dtype=np.float64)
+        self.priority_counts = pd.Series(dtype=np.int64)
+        self.orders = 0
+        self.outliers = {
+            col: OutlierBounds(*rule)
+            for col, rule in (outlier_rules or OUTLIER_RULES).items()
+        }
+
+    def update(self, chunk):
+        self.orders += len(chunk)
+        self.units_counts = self.units_counts.add(
+            chunk["Units Sold"].value_counts(), fill_value=0
+        )
+        self.priority_counts = self.priority_counts.add(
+            chunk["Order Priority"].value_counts(), fill_value=0
+        )
+        for col, bounds in self.outliers.items():
+            bounds.update(chunk[col])
+
+    def units_median(self):
+        counts = self.units_counts.sort_index()
+        cum = counts.cumsum().to_numpy()
+        total = cum[-1]
+        lo = counts.index[np.searchsorted(cum, (total + 1) // 2)]
+        hi = counts.index[np.searchsorted(cum, total // 2 + 1)]
+        return (lo + hi) / 2
+
+    def priority_mode(self):
+        counts = self.priority_counts
+        return min(counts[counts == counts.max()].index)
+
+
+def read_chunks(path, chunksize):
+    yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def csv_ranges(path, chunksize, block=1 << 24):
+    # Byte ranges of chunksize lines each after the header line, found by
+    # counting newlines, so pool processes can each read and parse their
+    # own range. No field in this data holds a newline.
+    with open(path, "rb") as f:
+        f.readline()
+        start = pos = f.tell()
+        needed = chunksize
+        ranges = []
+        for data in iter(lambda: f.read(block), b""):
+            ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+            while needed <= len(ends):
+                stop = pos + int(ends[needed - 1]) + 1
+                ranges.append((start, stop))
+                ends = ends[needed:]
+                start, needed = stop, chunksize
+            needed -= len(ends)
+            pos += len(data)
+    if pos > start or not ranges:
+        ranges.append((start, pos))
+    return ranges
+
+
+def read_range(span, path, usecols=None):
+    start, stop = span
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(stop - start)
+    return pd.read_csv(io.BytesIO(header + data), usecols=usecols)
+
+
+def read_kept(task, path):
+    # Parses a range and drops the rows scan_statistics found were repeats,
+    # numbering the rest as read_chunks would have.
+    span, first_row, keep = task
+    chunk = read_range(span, path)
+    chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+    if keep is None:
+        return chunk
+    return chunk[np.unpackbits(keep, count=len(chunk)).astype(bool)]
+
+
+def unique_chunks(path, chunksize, seen=None):
+    if seen is None:
+        seen = OrderIdFilter()
+    for chunk in read_chunks(path, chunksize):
+        keep = seen.first_seen(chunk["Order ID"])
+        yield chunk if keep.all() else chunk[keep]
+
+
+def scan_statistics(
+    path=SOURCE_PATH,
+    chunksize=CHUNKSIZE,
+    seen=None,
+    outlier_rules=None,
+    tasks=None,
+    pool=None,
+):
+    # Pool processes parse only the columns the dedup and the statistics
+    # read; the dedup itself runs here, in file order. When tasks is a
+    # list, it gets a (range, first row, packed keep mask) task per range
+    # for read_kept, so the cleaning pass need not dedup again.
+    if seen is None:
+        seen = OrderIdFilter()
+    stats = ColumnStatistics(outlier_rules)
+    cols = ["Order ID", "Units Sold", "Order Priority"] + list(stats.outliers)
+    ranges = csv_ranges(path, chunksize)
+    first_row = 0
+    with (
+        nullcontext(pool)
+        if pool is not None
+        else process_pool(min(PROCESSES, len(ranges)))
+    ) as pool:
+        parts = map_chunks(read_range, ranges, path, cols, pool=pool)
+        for span, chunk in zip(ranges, parts):
+            keep = seen.first_seen(chunk["Order ID"])
+            stats.update(chunk if keep.all() else chunk[keep])
+            if tasks is not None:
+                mask = None if keep.all() else np.packbits(keep)
+                tasks.append((span, first_row, mask))
+            first_row += len(chunk)
+    return stats
+
+
+def clean_chunk(chunk, stats):
+    for col in date_cols:
+        chunk[col] = parse_days(chunk[col], DATE_FORMAT)
+    # Units are whole numbers, so the median fill is rounded to fit int32.
+    chunk["Units Sold"] = chunk["Units Sold"].fillna(round(stats.units_median()))
+    chunk["Order Priority"] = chunk["Order Priority"].fillna(stats.priority_mode())
+    chunk = apply_schema(chunk)
+    keep = np.ones(len(chunk), dtype=bool)
+    for col, bounds in stats.outliers.items():
+        keep &= bounds.keep(chunk[col]).to_numpy()
+    return chunk if keep.all() else chunk[keep]
+
+
+def clean_chunks(path=SOURCE_PATH, chunksize=CHUNKSIZE, stats=None, outlier_rules=None):
+    if stats is None:
+        stats = scan_statistics(path, chunksize, outlier_rules=outlier_rules)
+    yield from map_chunks(clean_chunk, unique_chunks(path, chunksize), stats)
+
+
+def add_calendar_columns(data):
+    # The calendar keys and shipping time every aggregate groups or sums
+    # on, derived once here rather than per use.
+    year, month, day = calendar(data["Order Date"].to_numpy())
+    data["Day"] = day.astype(SCHEMA["Day"])
+    data["Month"] = month.astype(SCHEMA["Month"])
+    data["Year"] = year.astype(SCHEMA["Year"])
+    data["Shipping Days"] = (data["Ship Date"] - data["Order Date"]).astype(
+        SCHEMA["Shipping Days"]
+    )
+    return data
+
+
+def add_order_metrics(data, order_count):
+    data["Shipping Time (days)"] = data["Ship Date"] - data["Order Date"]
+    data["Average Order Value (AOV)"] = data["Total Revenue"] / order_count
+    data["Profit Margin"] = (data["Total Profit"] / data["Total Revenue"]) * 100
+    return data
+
+
+def clean_data_chunks(path=SOURCE_PATH, chunksize=CHUNKSIZE, outlier_rules=None):
+    for chunk in clean_chunks(path, chunksize, outlier_rules=outlier_rules):
+        yield add_calendar_columns(chunk)
+
+
+def load_clean_data(path=SOURCE_PATH, chunksize=CHUNKSIZE, outlier_rules=None):
+    return concat_chunks(clean_data_chunks(path, chunksize, outlier_rules))
+
+
+def write_cleaned_dataset(
+    path=SOURCE_PATH, out=CLEANED_PATH, chunksize=CHUNKSIZE, outlier_rules=None
+):
+    stats = scan_statistics(path, chunksize, outlier_rules=outlier_rules)
+    header = True
+    for chunk in clean_chunks(path, chunksize, stats):
+        chunk = add_order_metrics(chunk, stats.orders)
+        for col in date_cols:
+            chunk[col] = day_dates(chunk[col])
+        chunk.to_csv(
+            out,
+            mode="w" if header else "a",
+            header=header,
+            index=False,
+            encoding="utf-8",
+            date_format="%Y-%m-%d",
+        )
+        header = False
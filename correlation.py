@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from cache import BLOCK_ROWS
+from schema import date_cols
+
+# Day numbers and the shipping time derived from them are stored as
+# integers, but are not measures the matrix is about.
+excluded_cols = date_cols + ["Shipping Days"]
+
+
+class CoMoments:
+    # Pairwise-complete co-moments of a set of numeric columns. For each pair
+    # (i, j), over the rows where both are present: the count n[i, j], the
+    # mean of column i mean[i, j], its sum of squared deviations m2[i, j]
+    # and the sum of cross deviations cxy[i, j]. A block of rows is summed
+    # about its own column means, and blocks and partials gathered over
+    # separate chunks merge pairwise (Chan, Golub & LeVeque), so a nearly
+    # constant column keeps its variance where raw sums of squares would
+    # cancel. Partials are not changed once merged, so they can be shared.
+    def __init__(self, columns):
+        k = len(columns)
+        self.columns = list(columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.cxy = np.zeros((k, k))
+
+    @classmethod
+    def from_block(cls, columns, block):
+        result = cls(columns)
+        if not len(block):
+            return result
+        present = ~np.isnan(block)
+        mask = present.astype(np.float64)
+        center = np.nansum(block, axis=0) / np.maximum(present.sum(axis=0), 1)
+        x = np.where(present, block - center, 0.0)
+        n = mask.T @ mask
+        sx = x.T @ mask
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, sx / n, 0.0)
+        result.n = n
+        result.mean = mean + center[:, None]
+        result.m2 = (x * x).T @ mask - mean * sx
+        result.cxy = x.T @ x - mean * sx.T
+        return result
+
+    def merge(self, other):
+        merged = CoMoments(self.columns)
+        n = self.n + other.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(n > 0, other.n / n, 0.0)
+        delta = other.mean - self.mean
+        # n_a * n_b / n, the weight of the squared difference of the means.
+        scale = self.n * weight
+        merged.n = n
+        merged.mean = self.mean + delta * weight
+        merged.m2 = self.m2 + other.m2 + delta * delta * scale
+        merged.cxy = self.cxy + other.cxy + delta * delta.T * scale
+        return merged
+
+    def update(self, block):
+        merged = self.merge(CoMoments.from_block(self.columns, block))
+        self.n, self.mean, self.m2, self.cxy = (
+            merged.n,
+            merged.mean,
+            merged.m2,
+            merged.cxy,
+        )
+
+    @classmethod
+    def combine(cls, parts, columns=None):
+        parts = list(parts)
+        if parts and columns in (None, parts[0].columns):
+            merged, parts = parts[0], parts[1:]
+        else:
+            merged = cls(columns if columns is not None else parts[0].columns)
+        for part in parts:
+            merged = merged.merge(part)
+        return merged
+
+    def corr(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.cxy / np.sqrt(self.m2 * self.m2.T)
+        return pd.DataFrame(
+            np.clip(corr, -1, 1), index=self.columns, columns=self.columns
+        )
+
+
+def numeric_cols(data):
+    return [
+        col
+        for col in data.columns
+        if col not in excluded_cols
+        and pd.api.types.is_numeric_dtype(data[col])
+        and not pd.api.types.is_bool_dtype(data[col])
+    ]
+
+
+def moments(data, block_rows=BLOCK_ROWS):
+    # Co-moments of the numeric columns without materialising them: only
+    # one block of rows is converted to float64 at a time.
+    columns = numeric_cols(data)
+    result = CoMoments(columns)
+    values = [data[col].to_numpy() for col in columns]
+    for start in range(0, len(data), block_rows):
+        block = np.column_stack(
+            [v[start : start + block_rows].astype(np.float64) for v in values]
+        )
+        result.update(block)
+    return result
+
+
+def correlation(data, block_rows=BLOCK_ROWS):
+    # data.select_dtypes(np.number).corr(), a block of rows at a time.
+    return moments(data, block_rows).corr()
+
+
+def significant(matrix, threshold):
+    # The (row, column, value) pairs off the diagonal whose correlation is
+    # above threshold in magnitude, column by column.
+    values = matrix.to_numpy()
+    mask = np.abs(values) > threshold
+    np.fill_diagonal(mask, False)
+    return [
+        (matrix.index[i], matrix.columns[j], values[i, j])
+        for j, i in np.argwhere(mask.T)
+    ]
+
+
+class KeyedMoments:
+    # Co-moments for every combination of the key columns, so the
+    # correlation of any filtered set of keys merges from stored sums
+    # instead of a pass over the rows.
+    def __init__(self, keys, columns, moments):
+        self.keys = keys
+        self.columns = columns
+        self.moments = moments
+
+    @classmethod
+    def from_frame(cls, data, keys, groups=None):
+        if groups is None:
+            groups = data.groupby(keys, observed=True).indices
+        columns = numeric_cols(data)
+        values = np.column_stack(
+            [data[col].to_numpy().astype(np.float64) for col in columns]
+        )
+        result = {}
+        for key, rows in groups.items():
+            result[key] = CoMoments(columns)
+            result[key].update(values[rows])
+        return cls(keys, columns, result)
+
+    @classmethod
+    def combine(cls, parts):
+        # Folded into a copy of the first part's dict, so only the keys a
+        # later part holds are merged and the rest are shared as they are.
+        parts = list(parts)
+        result = dict(parts[0].moments)
+        for part in parts[1:]:
+            for key, moments in part.moments.items():
+                result[key] = result[key].merge(moments) if key in result else moments
+        return cls(parts[0].keys, parts[0].columns, result)
+
+    def merged(self, keys):
+        return CoMoments.combine(
+            [self.moments[key] for key in keys], columns=self.columns
+        )
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from schema import category_cols, money
+
+dimension_cols = [
+    "Year",
+    "Month",
+    "Region",
+    "Country",
+    "Item Type",
+    "Sales Channel",
+    "Order Priority",
+]
+
+measure_cols = [
+    "Orders",
+    "Units Sold",
+    "Unit Price",
+    "Total Revenue",
+    "Total Cost",
+    "Total Profit",
+    "Total Profit Sq",
+    "Shipping Days",
+]
+
+# Quantile KPIs are sketched, and correlation co-moments summed, per (Year,
+# Region, Item Type, Sales Channel): the coarsest key every dashboard filter
+# can still be resolved against. A second set per month resolves the whole
+# months of a date range's partial first and last year.
+sketch_cols = ["Year", "Region", "Item Type", "Sales Channel"]
+month_sketch_cols = ["Year", "Month", "Region", "Item Type", "Sales Channel"]
+
+
+def measure_values(data):
+    return {
+        "Orders": np.ones(len(data), dtype=np.int64),
+        "Units Sold": data["Units Sold"].to_numpy(),
+        "Unit Price": money(data["Unit Price"]),
+        "Total Revenue": data["Total Revenue"].to_numpy(dtype=float),
+        "Total Cost": data["Total Cost"].to_numpy(dtype=float),
+        "Total Profit": data["Total Profit"].to_numpy(dtype=float),
+        "Total Profit Sq": data["Total Profit"].to_numpy(dtype=float) ** 2,
+        "Shipping Days": data["Shipping Days"].to_numpy(dtype=np.int64),
+    }
+
+
+def sketch_values(data):
+    return {
+        "Order Value": data["Total Revenue"].to_numpy(dtype=float),
+        "Shipping Days": data["Shipping Days"].to_numpy(dtype=float),
+    }
+
+
+class SalesCube:
+    # One row per observed combination of the dimensions with additive
+    # measures. Every summary in the dashboard is a roll-up of these cells, and
+    # cubes built over separate partitions merge by adding their cells.
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, data):
+        key = np.zeros(len(data), dtype=np.int64)
+        levels = []
+        for col in dimension_cols:
+            codes, uniques = pd.factorize(data[col], sort=True)
+            key = key * len(uniques) + codes
+            levels.append(uniques)
+        cell, cell_keys = pd.factorize(key)
+
+        cells = {}
+        rest = cell_keys
+        for col, uniques in reversed(list(zip(dimension_cols, levels))):
+            rest, codes = np.divmod(rest, len(uniques))
+            if col in category_cols:
+                # Kept categorical: every roll-up groups on these, and
+                # grouping on codes is several times faster than on strings.
+                cells[col] = pd.Categorical.from_codes(codes, np.asarray(uniques))
+            else:
+                cells[col] = np.asarray(uniques)[codes]
+        cells = {col: cells[col] for col in dimension_cols}
+
+        for col, values in measure_values(data).items():
+            sums = np.bincount(cell, weights=values, minlength=len(cell_keys))
+            # Integer measures stay integral so counts keep printing as
+            # "512,871" rather than "512,871.0".
+            cells[col] = sums.astype(np.int64) if values.dtype.kind in "iu" else sums
+        return cls(pd.DataFrame(cells))
+
+    @classmethod
+    def combine(cls, cubes):
+        # One group-by over all partial cubes, in the order given, so the
+        # sums do not depend on how many processes built the partials.
+        parts = [cube.cells for cube in cubes]
+        for col in category_cols:
+            categories = pd.Index([])
+            for part in parts:
+                categories = categories.union(part[col].cat.categories)
+            parts = [
+                part.assign(**{col: part[col].cat.set_categories(categories)})
+                for part in parts
+            ]
+        cells = pd.concat(parts, ignore_index=True)
+        return cls(
+            cells.groupby(dimension_cols, sort=False, as_index=False, observed=True)[
+                measure_cols
+            ].sum()
+        )
+
+    def merge(self, other):
+        return SalesCube.combine([self, other])
+
+    def rollup(self, keys, measures=None):
+        return self.cells.groupby(keys, observed=True)[measures or measure_cols].sum()
+
+    def totals(self):
+        return {col: self.cells[col].sum() for col in measure_cols}
+
+    def top(self, key, measure, n=3):
+        totals = self.rollup(key, [measure])[measure]
+        return totals.sort_values(ascending=False).head(n)
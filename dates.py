@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+# Dates are held as int32 day numbers, days since 1970-01-01: half the size
+# of datetime64, and ranges, differences and calendar keys are plain
+# integer arithmetic.
+
+
+def parse_days(values, format):
+    # A large file repeats a few thousand distinct dates over millions of
+    # rows, so each distinct string is parsed once and the day numbers are
+    # spread back by code.
+    codes, uniques = pd.factorize(values)
+    if (codes < 0).any():
+        raise ValueError(f"{values.name} has missing dates")
+    days = pd.to_datetime(uniques, format=format).to_numpy().astype("datetime64[D]")
+    return days.astype(np.int64).astype(np.int32)[codes]
+
+
+def calendar(days):
+    # Year, month and day of the month of each day number, worked out once
+    # per distinct day.
+    uniques, inverse = np.unique(days, return_inverse=True)
+    dates = uniques.astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    year = years.astype(np.int64) + 1970
+    month = (months - years).astype(np.int64) + 1
+    day = (dates - months).astype(np.int64) + 1
+    return year[inverse], month[inverse], day[inverse]
+
+
+def day_dates(days):
+    return np.asarray(days).astype("datetime64[D]")
+
+
+def day_date(day):
+    return np.datetime64(int(day), "D").item()
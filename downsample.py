@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+# Most bars a bar trace is drawn with; a screen is at most a few thousand
+# pixels wide.
+MAX_BARS = 250
+
+
+def top_n(frame, col, n=MAX_BARS, other="Other"):
+    # The n - 1 rows with the largest col, in their original order, and one
+    # more row summing the rest, labelled other in every text column.
+    if len(frame) <= n:
+        return frame
+    keep = np.sort(np.argsort(-frame[col].to_numpy(), kind="stable")[: n - 1])
+    rest = np.setdiff1d(np.arange(len(frame)), keep)
+    row = {
+        name: other if not pd.api.types.is_numeric_dtype(values) else np.nan
+        for name, values in frame.items()
+    }
+    row[col] = frame[col].iloc[rest].sum()
+    return pd.concat([frame.iloc[keep], pd.DataFrame([row])], ignore_index=True)
@@ -1,51 +1,90 @@
-import pandas as pd
-import numpy as np
-from scipy import stats
-import plotly.express as px
 import plotly.graph_objs as go
-from dash import Dash, dcc, html, Input, Output, dash_table
+from dash import Dash, dcc, html, ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import webbrowser as wb
 from threading import Timer
 
-df = pd.read_csv("assets/Amazon Sales data.csv")
+from cleaning import SOURCE_PATH
+from correlation import significant
+from dates import day_date
+from downsample import top_n
+from figures import FigureRegistry, point_text
+from memo import memoize
+from metrics import instrument, stage
+from prerender import data_version, load_bundle, serve_bundle
+from query import SalesQuery, filter_cols
+from scheduler import Reloader
+from store import groupings, load_store
+from tables import IndexedTable, paged_table
 
-df["Order Date"] = pd.to_datetime(df["Order Date"])
-df["Ship Date"] = pd.to_datetime(df["Ship Date"])
-df = df.drop_duplicates(subset="Order ID")
-df["Units Sold"] = df["Units Sold"].fillna(df["Units Sold"].median())
-df["Order Priority"] = df["Order Priority"].fillna(df["Order Priority"].mode()[0])
+FIGURE_TTL = 600
 
-numeric_cols = [
-    "Unit Price",
-    "Unit Cost",
-    "Total Revenue",
-    "Total Cost",
-    "Total Profit",
-]
-for col in numeric_cols:
-    df[col] = df[col].astype(float)
+figures = FigureRegistry(lambda key: sales_view(key))
 
-cdf = df[(np.abs(stats.zscore(df["Total Profit"])) < 3)]
 
-cdf["Order Date"] = pd.to_datetime(cdf["Order Date"])
-cdf["Day"] = cdf["Order Date"].dt.day
-cdf["Month"] = cdf["Order Date"].dt.month
-cdf["Year"] = cdf["Order Date"].dt.year
+class SalesView:
+    # The summary frames every chart and table draws from, rolled up from
+    # the cube of one filtered slice of the orders, plus its merged quantile
+    # sketches and correlation matrix.
+    def __init__(self, cube, quantiles, correlation_matrix):
+        self.cube = cube
+        self.quantiles = quantiles
+        self.correlation_matrix = correlation_matrix
+        self.monthly_totals = cube.rollup(groupings["monthly"])
+        self.monthly_totals["Avg. Unit Price"] = (
+            self.monthly_totals["Unit Price"] / self.monthly_totals["Orders"]
+        )
+        self.monthly_revenue = self.monthly_totals[["Total Revenue"]].reset_index()
+        self.yearly_revenue = cube.rollup("Year", ["Total Revenue"]).reset_index()
+        self.region_country_revenue = cube.rollup(
+            groupings["region_country"], ["Total Revenue"]
+        ).reset_index()
+        self.monthly_revenue_sum = cube.rollup("Month", ["Total Revenue"]).reset_index()
+        self.data_tables = {
+            "monthly-revenue-table": IndexedTable(self.monthly_revenue),
+            "yearly-revenue-table": IndexedTable(self.yearly_revenue),
+        }
 
-monthly_revenue = cdf.groupby(["Year", "Month"])["Total Revenue"].sum().reset_index()
-yearly_revenue = cdf.groupby("Year")["Total Revenue"].sum().reset_index()
 
-region_country_revenue = (
-    cdf.groupby(["Region", "Country"])["Total Revenue"].sum().reset_index()
-)
+def filter_key(
+    regions=None,
+    items=None,
+    channels=None,
+    start_date=None,
+    end_date=None,
+    version=None,
+):
+    # Keys start with the data version they were made against, so cached
+    # views and figures of an old version are never served after a swap.
+    return (
+        version or current,
+        tuple(sorted(regions or ())),
+        tuple(sorted(items or ())),
+        tuple(sorted(channels or ())),
+        start_date,
+        end_date,
+    )
 
 
-def calculate_sales_metrics(data):
-    total_revenue = data["Total Revenue"].sum()
-    total_profit = data["Total Profit"].sum()
-    total_units_sold = data["Units Sold"].sum()
-    average_order_value = data["Total Revenue"].mean()
-    profit_margin = (data["Total Profit"].sum() / data["Total Revenue"].sum()) * 100
+@memoize(maxsize=32, ttl=FIGURE_TTL)
+def sales_view(key):
+    version, *values, start_date, end_date = key
+    filters = dict(zip(filter_cols, values))
+    query = version.sales_query
+    return SalesView(
+        query.slice(filters, start_date, end_date),
+        query.quantiles(filters, start_date, end_date),
+        query.correlation(filters, start_date, end_date),
+    )
+
+
+def calculate_sales_metrics(cube):
+    totals = cube.totals()
+    total_revenue = totals["Total Revenue"]
+    total_profit = totals["Total Profit"]
+    total_units_sold = totals["Units Sold"]
+    average_order_value = totals["Total Revenue"] / totals["Orders"]
+    profit_margin = (totals["Total Profit"] / totals["Total Revenue"]) * 100
     return (
         total_revenue,
         total_profit,
@@ -55,67 +94,76 @@ def calculate_sales_metrics(data):
     )
 
 
-def regional_and_country_performance(data):
-    region_performance = (
-        data.groupby("Region")["Total Revenue"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-    )
-    country_performance = (
-        data.groupby("Country")["Total Profit"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-    )
+def regional_and_country_performance(cube):
+    region_performance = cube.top("Region", "Total Revenue")
+    country_performance = cube.top("Country", "Total Profit")
     return region_performance, country_performance
 
 
-def product_and_sales_channel_insights(data):
-    item_performance = (
-        data.groupby("Item Type")["Units Sold"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-    )
-    sales_channel_revenue = data.groupby("Sales Channel")["Total Revenue"].sum()
+def product_and_sales_channel_insights(cube):
+    item_performance = cube.top("Item Type", "Units Sold")
+    sales_channel_revenue = cube.rollup("Sales Channel", ["Total Revenue"])[
+        "Total Revenue"
+    ]
     return item_performance, sales_channel_revenue
 
 
-def order_and_shipping_efficiency(data):
-    order_priority_revenue = data.groupby("Order Priority")["Total Revenue"].sum()
-    average_shipping_time = (data["Ship Date"] - data["Order Date"]).dt.days.mean()
+def order_and_shipping_efficiency(cube):
+    order_priority_revenue = cube.rollup("Order Priority", ["Total Revenue"])[
+        "Total Revenue"
+    ]
+    totals = cube.totals()
+    average_shipping_time = totals["Shipping Days"] / totals["Orders"]
     return order_priority_revenue, average_shipping_time
 
 
-total_revenue, total_profit, total_units_sold, average_order_value, profit_margin = (
-    calculate_sales_metrics(cdf)
-)
-region_performance, country_performance = regional_and_country_performance(cdf)
-item_performance, sales_channel_revenue = product_and_sales_channel_insights(cdf)
-order_priority_revenue, average_shipping_time = order_and_shipping_efficiency(cdf)
-
-numeric_columns = cdf.select_dtypes(include=[np.number])
-correlation_matrix = numeric_columns.corr()
-
-fig_corr = px.imshow(
-    correlation_matrix,
-    text_auto=True,
-    aspect="equal",
-    height=800,
-    title="Correlation Matrix",
-    color_continuous_scale="Viridis",
-)
+def order_distribution(cube, quantiles):
+    order_count = cube.totals()["Orders"]
+    distinct_countries = cube.cells["Country"].nunique()
+    median_order_value = quantiles["Order Value"].quantile(0.5)
+    p95_order_value = quantiles["Order Value"].quantile(0.95)
+    p95_shipping_time = quantiles["Shipping Days"].quantile(0.95)
+    return (
+        order_count,
+        distinct_countries,
+        median_order_value,
+        p95_order_value,
+        p95_shipping_time,
+    )
+
+
+@figures.register("correlation", section="correlation")
+def correlation_figure(view):
+    # plotly.express takes a third of a second to import and is only needed
+    # here, when the bundle is rendered; workers serving it never load it.
+    import plotly.express as px
+
+    fig_corr = px.imshow(
+        view.correlation_matrix,
+        text_auto=True,
+        aspect="equal",
+        height=800,
+        title="Correlation Matrix",
+        color_continuous_scale="Viridis",
+    )
+    return fig_corr
 
-findings = []
 
 threshold = 0.7
-for col in correlation_matrix.columns:
-    for idx in correlation_matrix.index:
-        if col != idx and abs(correlation_matrix.loc[idx, col]) > threshold:
-            findings.append(
-                f"{idx} and {col} have a significant correlation of {correlation_matrix.loc[idx, col]:.2f}"
-            )
+
+
+def correlation_findings(matrix):
+    return [
+        f"{idx} and {col} have a significant correlation of {value:.2f}"
+        for idx, col, value in significant(matrix, threshold)
+    ]
+
+
+def finding_items(findings):
+    if not findings:
+        return [html.Li(f"No correlations above {threshold} in magnitude.")]
+    return [html.Li(finding) for finding in findings]
+
 
 monthly_colors = [
     "#FF6347",
@@ -143,632 +191,559 @@ yearly_colors = [
     "#8B0000",
 ]
 
-monthly_revenue_sum = cdf.groupby("Month")["Total Revenue"].sum().reset_index()
-yearly_revenue_sum = cdf.groupby("Year")["Total Revenue"].sum().reset_index()
-
-mon_rev = monthly_revenue.round(2).astype(str)
-yer_rev = yearly_revenue.round(2).astype(str)
-
-msd_fig = go.Figure(
-    data=[
-        go.Pie(
-            labels=[
-                f"Month: {month}, Revenue: ${revenue:,.2f}, Percentage: {percent:.1f}%"
-                for month, revenue, percent in zip(
-                    monthly_revenue_sum["Month"],
-                    monthly_revenue_sum["Total Revenue"],
-                    100
-                    * monthly_revenue_sum["Total Revenue"]
-                    / monthly_revenue_sum["Total Revenue"].sum(),
-                )
-            ],
-            values=monthly_revenue_sum["Total Revenue"],
-            hoverinfo="label",
-            textinfo="label",
-            marker=dict(colors=monthly_colors),
-        )
-    ]
-)
-msd_fig.update_layout(title="Monthly Sales Distribution", height=500, showlegend=False)
-
-ysd_fig = go.Figure(
-    data=[
-        go.Pie(
-            labels=[
-                f"Year: {year}, Revenue: ${revenue}, Percentage: {percent:.1f}%"
-                for year, revenue, percent in zip(
-                    yearly_revenue["Year"],
-                    yearly_revenue["Total Revenue"],
-                    100
-                    * yearly_revenue["Total Revenue"].astype(float)
-                    / yearly_revenue["Total Revenue"].astype(float).sum(),
-                )
-            ],
-            values=yearly_revenue["Total Revenue"].astype(float),
-            hoverinfo="label",
-            textinfo="label",
-            marker=dict(colors=yearly_colors),
+
+@figures.register("monthly-distribution", section="distribution")
+def monthly_distribution_figure(view):
+    msd_fig = go.Figure(
+        data=[
+            go.Pie(
+                labels=view.monthly_revenue_sum["Month"],
+                values=view.monthly_revenue_sum["Total Revenue"],
+                **point_text(
+                    "Month: %{label}, Revenue: $%{value:,.2f}, "
+                    "Percentage: %{percent:.1%}"
+                ),
+                marker=dict(colors=monthly_colors),
+            )
+        ]
+    )
+    msd_fig.update_layout(
+        title="Monthly Sales Distribution", height=500, showlegend=False
+    )
+    return msd_fig
+
+
+@figures.register("yearly-distribution", section="distribution")
+def yearly_distribution_figure(view):
+    ysd_fig = go.Figure(
+        data=[
+            go.Pie(
+                labels=view.yearly_revenue["Year"],
+                values=view.yearly_revenue["Total Revenue"].astype(float),
+                **point_text(
+                    "Year: %{label}, Revenue: $%{value:.2f}, "
+                    "Percentage: %{percent:.1%}"
+                ),
+                marker=dict(colors=yearly_colors),
+            )
+        ]
+    )
+    ysd_fig.update_layout(
+        title="Yearly Sales Distribution", height=500, showlegend=False
+    )
+    return ysd_fig
+
+
+@figures.register("region-country")
+def region_country_figure(view):
+    bars = top_n(view.region_country_revenue, "Total Revenue")
+    rc_fig = go.Figure()
+    rc_fig.add_trace(
+        go.Bar(
+            x=bars["Country"],
+            y=bars["Total Revenue"],
+            name="Sales by Region and Country",
+            marker=dict(color=bars["Total Revenue"], colorscale="Viridis"),
+            customdata=bars["Region"],
+            **point_text(
+                "Region: %{customdata}, Country: %{x}<br>Total Revenue: $%{y:,.2f}"
+            ),
         )
-    ]
-)
-ysd_fig.update_layout(title="Yearly Sales Distribution", height=500, showlegend=False)
-
-rc_fig = go.Figure()
-rc_fig.add_trace(
-    go.Bar(
-        x=region_country_revenue["Country"],
-        y=region_country_revenue["Total Revenue"],
-        name="Sales by Region and Country",
-        marker=dict(
-            color=region_country_revenue["Total Revenue"], colorscale="Viridis"
+    )
+    rc_fig.update_layout(
+        title="Sales by Region and Country",
+        xaxis_title="Country",
+        yaxis_title="Total Revenue ($)",
+        height=800,
+        showlegend=False,
+        coloraxis=dict(
+            colorscale="Viridis",
+            colorbar=dict(title="Total Revenue ($)", tickformat="$,.2f"),
         ),
-        hoverinfo="y+text",
-        text=[
-            f"Region: {region}, Country: {country}<br>Total Revenue: ${revenue:,.2f}"
-            for region, country, revenue in zip(
-                region_country_revenue["Region"],
-                region_country_revenue["Country"],
-                region_country_revenue["Total Revenue"],
-            )
-        ],
+        bargap=0.2,
     )
-)
-rc_fig.update_layout(
-    title="Sales by Region and Country",
-    xaxis_title="Country",
-    yaxis_title="Total Revenue ($)",
-    height=800,
-    showlegend=False,
-    coloraxis=dict(
-        colorscale="Viridis",
-        colorbar=dict(title="Total Revenue ($)", tickformat="$,.2f"),
-    ),
-    bargap=0.2,
-)
-fig_monthly_trends = go.Figure()
-fig_monthly_trends.add_trace(
-    go.Scatter(
-        x=monthly_revenue["Year"].astype(str)
-        + "-"
-        + monthly_revenue["Month"].astype(str),
-        y=monthly_revenue["Total Revenue"],
-        mode="lines+markers",
-        line=dict(color="blue"),
-        name="Monthly Revenue",
+    return rc_fig
+
+
+def month_dates(frame):
+    months = (frame["Year"].to_numpy("int64") - 1970) * 12 + frame["Month"] - 1
+    return months.to_numpy().astype("datetime64[M]").astype("datetime64[D]")
+
+
+@figures.register("monthly-trends", section="quick-visuals")
+def monthly_trends_figure(view):
+    fig_monthly_trends = go.Figure()
+    fig_monthly_trends.add_trace(
+        go.Scatter(
+            x=month_dates(view.monthly_revenue),
+            y=view.monthly_revenue["Total Revenue"].to_numpy(),
+            mode="lines+markers",
+            line=dict(color="blue"),
+            name="Monthly Revenue",
+        )
     )
-)
-fig_monthly_trends.update_layout(
-    title="Monthly Sales Trends",
-    xaxis_title="Year-Month",
-    yaxis_title="Revenue",
-    template="plotly",
-    height=600,
-)
+    fig_monthly_trends.update_layout(
+        title="Monthly Sales Trends",
+        xaxis_title="Year-Month",
+        xaxis_tickformat="%Y-%m",
+        yaxis_title="Revenue",
+        template="plotly",
+        height=600,
+    )
+    return fig_monthly_trends
+
 
-fig_yearly_trends = go.Figure()
-fig_yearly_trends.add_trace(
-    go.Scatter(
-        x=yearly_revenue["Year"],
-        y=yearly_revenue["Total Revenue"],
-        mode="lines+markers",
-        line=dict(color="green"),
-        name="Yearly Revenue",
+@figures.register("yearly-trends", section="quick-visuals")
+def yearly_trends_figure(view):
+    fig_yearly_trends = go.Figure()
+    fig_yearly_trends.add_trace(
+        go.Scatter(
+            x=view.yearly_revenue["Year"],
+            y=view.yearly_revenue["Total Revenue"],
+            mode="lines+markers",
+            line=dict(color="green"),
+            name="Yearly Revenue",
+        )
     )
-)
-fig_yearly_trends.update_layout(
-    title="Yearly Sales Trends",
-    xaxis_title="Year",
-    yaxis_title="Revenue",
-    template="plotly",
-    height=600,
-)
+    fig_yearly_trends.update_layout(
+        title="Yearly Sales Trends",
+        xaxis_title="Year",
+        yaxis_title="Revenue",
+        template="plotly",
+        height=600,
+    )
+    return fig_yearly_trends
+
 
-monthly_revenue_diff = monthly_revenue["Total Revenue"].diff()
-fig_monthly_revenue_change = go.Figure()
-fig_monthly_revenue_change.add_trace(
-    go.Scatter(
-        x=monthly_revenue["Year"].astype(str)
-        + "-"
-        + monthly_revenue["Month"].astype(str),
-        y=monthly_revenue_diff,
-        mode="lines+markers",
-        line=dict(color="orange"),
-        name="Monthly Revenue Change",
+@figures.register("monthly-revenue-change", section="quick-visuals")
+def monthly_revenue_change_figure(view):
+    fig_monthly_revenue_change = go.Figure()
+    fig_monthly_revenue_change.add_trace(
+        go.Scatter(
+            x=month_dates(view.monthly_revenue),
+            y=view.monthly_revenue["Total Revenue"].diff().to_numpy(),
+            mode="lines+markers",
+            line=dict(color="orange"),
+            name="Monthly Revenue Change",
+        )
     )
-)
-fig_monthly_revenue_change.add_hline(y=0, line_dash="dash", line_color="black")
-fig_monthly_revenue_change.update_layout(
-    title="Monthly Revenue Change",
-    xaxis_title="Year-Month",
-    yaxis_title="Revenue Change",
-    template="plotly",
-    height=600,
-)
+    fig_monthly_revenue_change.add_hline(y=0, line_dash="dash", line_color="black")
+    fig_monthly_revenue_change.update_layout(
+        title="Monthly Revenue Change",
+        xaxis_title="Year-Month",
+        xaxis_tickformat="%Y-%m",
+        yaxis_title="Revenue Change",
+        template="plotly",
+        height=600,
+    )
+    return fig_monthly_revenue_change
+
 
-yearly_revenue_change = yearly_revenue["Total Revenue"].diff()
+@figures.register("yearly-revenue-change", section="quick-visuals")
+def yearly_revenue_change_figure(view):
+    yearly_revenue_change = view.yearly_revenue["Total Revenue"].diff()
 
-fig_yearly_revenue_change = go.Figure()
-fig_yearly_revenue_change.add_trace(
-    go.Scatter(
-        x=yearly_revenue["Year"],
-        y=yearly_revenue_change,
-        mode="lines+markers",
-        line=dict(color="purple"),
-        name="Yearly Revenue Change",
+    fig_yearly_revenue_change = go.Figure()
+    fig_yearly_revenue_change.add_trace(
+        go.Scatter(
+            x=view.yearly_revenue["Year"],
+            y=yearly_revenue_change,
+            mode="lines+markers",
+            line=dict(color="purple"),
+            name="Yearly Revenue Change",
+        )
     )
-)
-fig_yearly_revenue_change.add_hline(y=0, line_dash="dash", line_color="black")
-fig_yearly_revenue_change.update_layout(
-    title="Yearly Revenue Change",
-    xaxis_title="Year",
-    yaxis_title="Revenue Change",
-    template="plotly",
-    height=600,
-)
+    fig_yearly_revenue_change.add_hline(y=0, line_dash="dash", line_color="black")
+    fig_yearly_revenue_change.update_layout(
+        title="Yearly Revenue Change",
+        xaxis_title="Year",
+        yaxis_title="Revenue Change",
+        template="plotly",
+        height=600,
+    )
+    return fig_yearly_revenue_change
+
 
-fig_monthly_high_low = go.Figure()
-fig_monthly_high_low.add_trace(
-    go.Bar(
-        x=monthly_revenue["Year"].astype(str)
-        + "-"
-        + monthly_revenue["Month"].astype(str),
-        y=monthly_revenue["Total Revenue"],
-        marker=dict(color=monthly_revenue["Total Revenue"], colorscale="Viridis"),
-        name="Monthly Revenue",
+@figures.register("monthly-high-low", section="quick-visuals")
+def monthly_high_low_figure(view):
+    fig_monthly_high_low = go.Figure()
+    fig_monthly_high_low.add_trace(
+        go.Bar(
+            x=view.monthly_revenue["Year"].astype(str)
+            + "-"
+            + view.monthly_revenue["Month"].astype(str),
+            y=view.monthly_revenue["Total Revenue"],
+            marker=dict(
+                color=view.monthly_revenue["Total Revenue"], colorscale="Viridis"
+            ),
+            name="Monthly Revenue",
+        )
     )
-)
-max_monthly_sales = monthly_revenue["Total Revenue"].max()
-min_monthly_sales = monthly_revenue["Total Revenue"].min()
-fig_monthly_high_low.add_hline(
-    y=max_monthly_sales,
-    line_dash="dash",
-    line_color="red",
-    annotation_text=f"Highest: {max_monthly_sales:.2f}",
-)
-fig_monthly_high_low.add_hline(
-    y=min_monthly_sales,
-    line_dash="dash",
-    line_color="blue",
-    annotation_text=f"Lowest: {min_monthly_sales:.2f}",
-)
-fig_monthly_high_low.update_layout(
-    title="Monthly Sales with Highest and Lowest Points",
-    xaxis_title="Year-Month",
-    yaxis_title="Revenue",
-    template="plotly",
-    height=600,
-)
+    max_monthly_sales = view.monthly_revenue["Total Revenue"].max()
+    min_monthly_sales = view.monthly_revenue["Total Revenue"].min()
+    fig_monthly_high_low.add_hline(
+        y=max_monthly_sales,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Highest: {max_monthly_sales:.2f}",
+    )
+    fig_monthly_high_low.add_hline(
+        y=min_monthly_sales,
+        line_dash="dash",
+        line_color="blue",
+        annotation_text=f"Lowest: {min_monthly_sales:.2f}",
+    )
+    fig_monthly_high_low.update_layout(
+        title="Monthly Sales with Highest and Lowest Points",
+        xaxis_title="Year-Month",
+        yaxis_title="Revenue",
+        template="plotly",
+        height=600,
+    )
+    return fig_monthly_high_low
+
 
-fig_yearly_high_low = go.Figure()
-fig_yearly_high_low.add_trace(
-    go.Bar(
-        x=yearly_revenue["Year"],
-        y=yearly_revenue["Total Revenue"],
-        marker=dict(color=yearly_revenue["Total Revenue"], colorscale="Viridis"),
-        name="Yearly Revenue",
+@figures.register("yearly-high-low", section="quick-visuals")
+def yearly_high_low_figure(view):
+    fig_yearly_high_low = go.Figure()
+    fig_yearly_high_low.add_trace(
+        go.Bar(
+            x=view.yearly_revenue["Year"],
+            y=view.yearly_revenue["Total Revenue"],
+            marker=dict(
+                color=view.yearly_revenue["Total Revenue"], colorscale="Viridis"
+            ),
+            name="Yearly Revenue",
+        )
     )
-)
-max_yearly_sales = yearly_revenue["Total Revenue"].max()
-min_yearly_sales = yearly_revenue["Total Revenue"].min()
-fig_yearly_high_low.add_hline(
-    y=max_yearly_sales,
-    line_dash="dash",
-    line_color="red",
-    annotation_text=f"Highest: {max_yearly_sales:.2f}",
-)
-fig_yearly_high_low.add_hline(
-    y=min_yearly_sales,
-    line_dash="dash",
-    line_color="blue",
-    annotation_text=f"Lowest: {min_yearly_sales:.2f}",
-)
-fig_yearly_high_low.update_layout(
-    title="Yearly Sales with Highest and Lowest Points",
-    xaxis_title="Year",
-    yaxis_title="Revenue",
-    template="plotly",
-    height=600,
-)
+    max_yearly_sales = view.yearly_revenue["Total Revenue"].max()
+    min_yearly_sales = view.yearly_revenue["Total Revenue"].min()
+    fig_yearly_high_low.add_hline(
+        y=max_yearly_sales,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Highest: {max_yearly_sales:.2f}",
+    )
+    fig_yearly_high_low.add_hline(
+        y=min_yearly_sales,
+        line_dash="dash",
+        line_color="blue",
+        annotation_text=f"Lowest: {min_yearly_sales:.2f}",
+    )
+    fig_yearly_high_low.update_layout(
+        title="Yearly Sales with Highest and Lowest Points",
+        xaxis_title="Year",
+        yaxis_title="Revenue",
+        template="plotly",
+        height=600,
+    )
+    return fig_yearly_high_low
 
-app = Dash(__name__, title="Amazon Sales Analysis")
 
-app.layout = html.Div(
-    [
-        html.Div([html.H1("Amazon Sales Analysis")], id="header-container"),
-        #! ----             ----                ----                ----                ----
-        # * 1. Overview
+def overview_metrics(view):
+    # Averages, margins and quantiles of no orders are undefined; an empty
+    # selection says so instead of showing NaNs.
+    if view.cube.totals()["Orders"] == 0:
+        return [
+            html.Div(
+                [
+                    html.H3("1. Sales Metrics", className="hed"),
+                    html.P(
+                        "No orders match the selected filters.",
+                        className="hed sub-hed",
+                    ),
+                ],
+                className="ins-con",
+            )
+        ]
+    (
+        total_revenue,
+        total_profit,
+        total_units_sold,
+        average_order_value,
+        profit_margin,
+    ) = calculate_sales_metrics(view.cube)
+    region_performance, country_performance = regional_and_country_performance(
+        view.cube
+    )
+    item_performance, sales_channel_revenue = product_and_sales_channel_insights(
+        view.cube
+    )
+    order_priority_revenue, average_shipping_time = order_and_shipping_efficiency(
+        view.cube
+    )
+    (
+        order_count,
+        distinct_countries,
+        median_order_value,
+        p95_order_value,
+        p95_shipping_time,
+    ) = order_distribution(view.cube, view.quantiles)
+    return [
         html.Div(
             [
-                html.H2("1. Overview"),
-                html.P("Quick snippets of the analysis.", className="hed sub-hed"),
+                html.H3("1. Sales Metrics", className="hed"),
+                html.P(
+                    "Quick snippets of the analysis.",
+                    className="hed sub-hed",
+                ),
                 html.Div(
                     [
                         html.Div(
                             [
-                                html.H3("1. Sales Metrics", className="hed"),
-                                html.P(
-                                    "Quick snippets of the analysis.",
-                                    className="hed sub-hed",
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(
-                                                    "Total Units Sold", className="hed"
-                                                ),
-                                                html.H4(
-                                                    f"{total_units_sold:,}",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        ),
-                                        html.Div(
-                                            [
-                                                html.P(
-                                                    "Average Order Value",
-                                                    className="hed",
-                                                ),
-                                                html.H4(
-                                                    f"${average_order_value:,.2f}",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        ),
-                                        html.Div(
-                                            [
-                                                html.P(
-                                                    "Total Revenue", className="hed"
-                                                ),
-                                                html.H4(
-                                                    f"${total_revenue:,.2f}",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        ),
-                                        html.Div(
-                                            [
-                                                html.P("Total Profit", className="hed"),
-                                                html.H4(
-                                                    f"${total_profit:,.2f}",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        ),
-                                        html.Div(
-                                            [
-                                                html.P(
-                                                    "Profit Margin", className="hed"
-                                                ),
-                                                html.H4(
-                                                    f"{profit_margin:.2f}%",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        ),
-                                    ],
-                                    className="i-c",
+                                html.P("Total Units Sold", className="hed"),
+                                html.H4(
+                                    f"{total_units_sold:,}",
+                                    className="val",
                                 ),
                             ],
-                            className="ins-con",
+                            className="insights",
                         ),
                         html.Div(
                             [
-                                html.H3(
-                                    "2. Regional and Country Performance",
-                                    className="hed",
-                                ),
-                                html.P(
-                                    "Top 3 Regions by Revenue", className="hed sub-hed"
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(region, className="hed"),
-                                                html.H4(
-                                                    f"${revenue:,.2f}", className="val"
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                        for region, revenue in region_performance.items()
-                                    ],
-                                    className="i-c",
-                                ),
                                 html.P(
-                                    "Top 3 Countries by Profit", className="hed sub-hed"
+                                    "Average Order Value",
+                                    className="hed",
                                 ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(country, className="hed"),
-                                                html.H4(
-                                                    f"${profit:,.2f}", className="val"
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                        for country, profit in country_performance.items()
-                                    ],
-                                    className="i-c",
+                                html.H4(
+                                    f"${average_order_value:,.2f}",
+                                    className="val",
                                 ),
                             ],
-                            className="ins-con",
+                            className="insights",
                         ),
                         html.Div(
                             [
-                                html.H3(
-                                    "3. Products and Sales Channel Insights",
-                                    className="hed",
-                                ),
-                                html.P(
-                                    "Top 3 Best Selling Item Types",
-                                    className="hed sub-hed",
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(item, className="hed"),
-                                                html.H3(
-                                                    f"{units_sold:,}", className="val"
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                        for item, units_sold in item_performance.items()
-                                    ],
-                                    className="i-c",
-                                ),
-                                html.P(
-                                    "Revenue by Sales Channel", className="hed sub-hed"
-                                ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(channel, className="hed"),
-                                                html.H3(
-                                                    f"${revenue:,.2f}", className="val"
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                        for channel, revenue in sales_channel_revenue.items()
-                                    ],
-                                    className="i-c",
+                                html.P("Total Revenue", className="hed"),
+                                html.H4(
+                                    f"${total_revenue:,.2f}",
+                                    className="val",
                                 ),
                             ],
-                            className="ins-con",
+                            className="insights",
                         ),
                         html.Div(
                             [
-                                html.H3(
-                                    "4. Order and Shipping Efficiency", className="hed"
+                                html.P("Total Profit", className="hed"),
+                                html.H4(
+                                    f"${total_profit:,.2f}",
+                                    className="val",
                                 ),
-                                html.P(
-                                    "Order Priority Impact on Revenue by Critical, High, Medium & Low",
-                                    className="hed sub-hed",
+                            ],
+                            className="insights",
+                        ),
+                        html.Div(
+                            [
+                                html.P("Profit Margin", className="hed"),
+                                html.H4(
+                                    f"{profit_margin:.2f}%",
+                                    className="val",
                                 ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P(priority, className="hed"),
-                                                html.H4(
-                                                    f"${revenue:,.2f}", className="val"
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                        for priority, revenue in order_priority_revenue.items()
-                                    ],
-                                    className="i-c",
+                            ],
+                            className="insights",
+                        ),
+                        html.Div(
+                            [
+                                html.P("Orders", className="hed"),
+                                html.H4(
+                                    f"{order_count:,}",
+                                    className="val",
                                 ),
-                                html.P(
-                                    "Average Shipping Time", className="hed sub-hed"
+                            ],
+                            className="insights",
+                        ),
+                        html.Div(
+                            [
+                                html.P("Distinct Countries", className="hed"),
+                                html.H4(
+                                    f"{distinct_countries:,}",
+                                    className="val",
                                 ),
-                                html.Div(
-                                    [
-                                        html.Div(
-                                            [
-                                                html.P("Days", className="hed"),
-                                                html.H4(
-                                                    f"{average_shipping_time:.2f}",
-                                                    className="val",
-                                                ),
-                                            ],
-                                            className="insights",
-                                        )
-                                    ],
-                                    className="i-c",
+                            ],
+                            className="insights",
+                        ),
+                        html.Div(
+                            [
+                                html.P("Median Order Value", className="hed"),
+                                html.H4(
+                                    f"${median_order_value:,.2f}",
+                                    className="val",
                                 ),
                             ],
-                            className="ins-con",
+                            className="insights",
                         ),
                         html.Div(
                             [
-                                html.H3("5. Quick Visuals", className="hed"),
-                                html.P(
-                                    "Here are the visualizations from the analysis",
-                                    className="hed sub-hed",
+                                html.P("95th Percentile Order Value", className="hed"),
+                                html.H4(
+                                    f"${p95_order_value:,.2f}",
+                                    className="val",
                                 ),
-                                dcc.Graph(figure=fig_monthly_trends),
-                                dcc.Graph(figure=fig_monthly_revenue_change),
-                                dcc.Graph(figure=fig_yearly_trends),
-                                dcc.Graph(figure=fig_yearly_revenue_change),
-                                dcc.Graph(figure=fig_monthly_high_low),
-                                dcc.Graph(figure=fig_yearly_high_low),
                             ],
-                            className="ins-con",
+                            className="insights",
                         ),
                     ],
-                    className="insights-container",
+                    className="i-c",
                 ),
             ],
-            id="overview-container",
+            className="ins-con",
         ),
-        #! ----             ----                ----                ----                ----
-        # * 2. Monthly & Yearly Sales Distribution
         html.Div(
             [
-                html.H2("2. Monthly & Yearly Sales Distribution"),
-                html.P(
-                    "Hover over the segments to see detailed revenue and percentage contribution.",
-                    className="hed sub-hed",
+                html.H3(
+                    "2. Regional and Country Performance",
+                    className="hed",
                 ),
-                dcc.Graph(figure=msd_fig),
-                dash_table.DataTable(
-                    columns=[{"name": i, "id": i} for i in mon_rev.columns],
-                    data=mon_rev.to_dict("records"),
-                    style_table={"overflowX": "auto"},
-                    style_header={
-                        "backgroundColor": "rgb(230, 230, 230)",
-                        "fontWeight": "bold",
-                    },
-                    style_cell={"textAlign": "center", "padding": "5px"},
-                    page_size=100,
+                html.P("Top 3 Regions by Revenue", className="hed sub-hed"),
+                html.Div(
+                    [
+                        html.Div(
+                            [
+                                html.P(region, className="hed"),
+                                html.H4(f"${revenue:,.2f}", className="val"),
+                            ],
+                            className="insights",
+                        )
+                        for region, revenue in region_performance.items()
+                    ],
+                    className="i-c",
                 ),
-                dcc.Graph(figure=ysd_fig),
-                dash_table.DataTable(
-                    columns=[{"name": i, "id": i} for i in yer_rev.columns],
-                    data=yer_rev.to_dict("records"),
-                    style_table={"overflowX": "auto"},
-                    style_header={
-                        "backgroundColor": "rgb(230, 230, 230)",
-                        "fontWeight": "bold",
-                    },
-                    style_cell={"textAlign": "center", "padding": "5px"},
-                    page_size=100,
+                html.P("Top 3 Countries by Profit", className="hed sub-hed"),
+                html.Div(
+                    [
+                        html.Div(
+                            [
+                                html.P(country, className="hed"),
+                                html.H4(f"${profit:,.2f}", className="val"),
+                            ],
+                            className="insights",
+                        )
+                        for country, profit in country_performance.items()
+                    ],
+                    className="i-c",
                 ),
             ],
-            id="sales-distribution-container",
+            className="ins-con",
         ),
-        #! ----             ----                ----                ----                ----
-        # * 3. Sales Trends
         html.Div(
             [
-                html.H2("3. Sales Trends"),
+                html.H3(
+                    "3. Products and Sales Channel Insights",
+                    className="hed",
+                ),
                 html.P(
-                    "Choose the option from the dropdown list below to see detailed information of Monthly by year, Monthly, Yearly and Regionally sales trend data.",
+                    "Top 3 Best Selling Item Types",
                     className="hed sub-hed",
                 ),
-                dcc.Dropdown(
-                    id="sales-trend-dropdown",
-                    options=[
-                        {"label": "Monthly Sales by Year", "value": "monthly-by-year"},
-                        {"label": "Monthly Sales Trends", "value": "monthly"},
-                        {"label": "Yearly Sales Trends", "value": "yearly"},
-                        {
-                            "label": "Sales by Region and Country",
-                            "value": "region_country",
-                        },
+                html.Div(
+                    [
+                        html.Div(
+                            [
+                                html.P(item, className="hed"),
+                                html.H3(f"{units_sold:,}", className="val"),
+                            ],
+                            className="insights",
+                        )
+                        for item, units_sold in item_performance.items()
                     ],
-                    value="monthly-by-year",
-                    className="dash-dropdown sub-hed",
-                ),
-                html.Div(id="sales-trends"),
-            ],
-            id="sales-trend-container",
-        ),
-        #! ----             ----                ----                ----                ----
-        # * 4. Correlation Matrix
-        html.Div(
-            [
-                html.H2("4. Correlation Matrix"),
-                html.P(
-                    "",
-                    className="hed sub-hed",
+                    className="i-c",
                 ),
-                dcc.Graph(figure=fig_corr),
-                html.H3(
-                    "Findings from Correlation Matrix",
-                    className="hed",
+                html.P("Revenue by Sales Channel", className="hed sub-hed"),
+                html.Div(
+                    [
+                        html.Div(
+                            [
+                                html.P(channel, className="hed"),
+                                html.H3(f"${revenue:,.2f}", className="val"),
+                            ],
+                            className="insights",
+                        )
+                        for channel, revenue in sales_channel_revenue.items()
+                    ],
+                    className="i-c",
                 ),
-                html.Ul([html.Li(finding) for finding in findings]),
             ],
-            className="correlations-container",
+            className="ins-con",
         ),
-        #! ----             ----                ----                ----                ----
-        # * 5. Conclusion & Findings
         html.Div(
             [
-                html.H2("5. Conclusion & Findings"),
+                html.H3("4. Order and Shipping Efficiency", className="hed"),
                 html.P(
-                    "Based on the analysis of the sales data, we can draw the following conclusions:",
+                    "Order Priority Impact on Revenue by Critical, High, Medium & Low",
                     className="hed sub-hed",
                 ),
-                html.Ul(
+                html.Div(
                     [
-                        html.Li(
-                            f"The total revenue generated over the analyzed period is ${total_revenue:,.2f}."
-                        ),
-                        html.Li(
-                            f"The total profit earned is ${total_profit:,.2f}%, indicating a profit margin of {profit_margin:.2f}%."
-                        ),
-                        html.Li(
-                            f"A total of {total_units_sold:,} units were sold, demonstrating strong sales volume."
-                        ),
-                        html.Li(
-                            f"The highest monthly sales occurred in Month {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmax()]['Month']} of Year {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmax()]['Year']}."
-                        ),
-                        html.Li(
-                            f"The lowest monthly sales were recorded in Month {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmin()]['Month']} of Year {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmin()]['Year']}."
-                        ),
-                        html.Li(
-                            f"The overall trend shows a significant increase in sales year-over-year, with Year {yearly_revenue.loc[yearly_revenue['Total Revenue'].astype(float).idxmax()]['Year']} having the highest revenue."
+                        html.Div(
+                            [
+                                html.P(priority, className="hed"),
+                                html.H4(f"${revenue:,.2f}", className="val"),
+                            ],
+                            className="insights",
+                        )
+                        for priority, revenue in order_priority_revenue.items()
+                    ],
+                    className="i-c",
+                ),
+                html.P("Average Shipping Time", className="hed sub-hed"),
+                html.Div(
+                    [
+                        html.Div(
+                            [
+                                html.P("Days", className="hed"),
+                                html.H4(
+                                    f"{average_shipping_time:.2f}",
+                                    className="val",
+                                ),
+                            ],
+                            className="insights",
                         ),
-                        html.Li(
-                            f"The overall trend shows a significant decrease in sales year-over-year, with Year {yearly_revenue.loc[yearly_revenue['Total Revenue'].astype(float).idxmin()]['Year']} having the lowest revenue."
+                        html.Div(
+                            [
+                                html.P("95th Percentile Days", className="hed"),
+                                html.H4(
+                                    f"{p95_shipping_time:.0f}",
+                                    className="val",
+                                ),
+                            ],
+                            className="insights",
                         ),
-                    ]
+                    ],
+                    className="i-c",
                 ),
             ],
-            id="conclusion-container",
+            className="ins-con",
         ),
-    ],
-    id="main-container",
-)
+    ]
 
 
-@app.callback(
-    Output("sales-trends", "children"),
-    Input("sales-trend-dropdown", "value"),
-)
-def update_sales_trend(selected_trend):
-    graphs = []
+@memoize(maxsize=64, ttl=FIGURE_TTL)
+def sales_trend_figures(selected_trend, key):
+    view = sales_view(key)
+    figures = []
     if selected_trend == "monthly-by-year":
-        for year in cdf["Year"].unique():
-            filtered_data = monthly_revenue[monthly_revenue["Year"] == year]
+        for year in view.monthly_totals.index.unique("Year"):
+            filtered_data = view.monthly_totals.loc[year].reset_index()
             fig = go.Figure()
             fig.add_trace(
                 go.Bar(
                     x=filtered_data["Month"],
-                    y=filtered_data["Total Revenue"].astype(float),
+                    y=filtered_data["Total Revenue"],
                     name=f"Monthly Sales in {year}",
                     marker=dict(
-                        color=filtered_data["Total Revenue"].astype(float),
+                        color=filtered_data["Total Revenue"],
                         colorscale="Viridis",
                     ),
-                    hoverinfo="y+text",
-                    text=[
-                        f"Month: {month}<br>Total Revenue: ${revenue:.2f}<br>Units Sold: {units_sold}<br>Avg. Unit Price: ${unit_price:.2f}<br>Total Cost: ${total_cost:.2f}<br>Total Profit: ${total_profit:.2f}"
-                        for month, revenue, units_sold, unit_price, total_cost, total_profit in zip(
-                            filtered_data["Month"],
-                            filtered_data["Total Revenue"].astype(float),
-                            cdf.groupby("Month")["Units Sold"].sum(),
-                            cdf.groupby("Month")["Unit Price"].mean(),
-                            cdf.groupby("Month")["Total Cost"].sum(),
-                            cdf.groupby("Month")["Total Profit"].sum(),
-                        )
-                    ],
+                    customdata=filtered_data[
+                        ["Units Sold", "Avg. Unit Price", "Total Cost", "Total Profit"]
+                    ].to_numpy("float64"),
+                    **point_text(
+                        "Month: %{x}<br>Total Revenue: $%{y:.2f}<br>"
+                        "Units Sold: %{customdata[0]:d}<br>"
+                        "Avg. Unit Price: $%{customdata[1]:.2f}<br>"
+                        "Total Cost: $%{customdata[2]:.2f}<br>"
+                        "Total Profit: $%{customdata[3]:.2f}"
+                    ),
                 )
             )
             fig.update_layout(
@@ -783,26 +758,19 @@ def update_sales_trend(selected_trend):
                 ),
                 bargap=0.2,
             )
-            graphs.append(dcc.Graph(figure=fig))
+            figures.append(fig.to_dict())
     elif selected_trend == "monthly":
         fig = go.Figure()
         fig.add_trace(
             go.Bar(
-                x=monthly_revenue["Month"],
-                y=monthly_revenue["Total Revenue"].astype(float),
+                x=view.monthly_revenue["Month"],
+                y=view.monthly_revenue["Total Revenue"].astype(float),
                 name="Monthly Sales",
                 marker=dict(
-                    color=monthly_revenue["Total Revenue"].astype(float),
+                    color=view.monthly_revenue["Total Revenue"].astype(float),
                     colorscale="Viridis",
                 ),
-                hoverinfo="y+text",
-                text=[
-                    f"Month: {month}<br>Total Revenue: ${revenue:.2f}"
-                    for month, revenue in zip(
-                        monthly_revenue["Month"],
-                        monthly_revenue["Total Revenue"].astype(float),
-                    )
-                ],
+                **point_text("Month: %{x}<br>Total Revenue: $%{y:.2f}"),
             )
         )
         fig.update_layout(
@@ -817,26 +785,19 @@ def update_sales_trend(selected_trend):
             ),
             bargap=0.2,
         )
-        graphs.append(dcc.Graph(figure=fig))
+        figures.append(fig.to_dict())
     elif selected_trend == "yearly":
         fig = go.Figure()
         fig.add_trace(
             go.Bar(
-                x=yearly_revenue["Year"],
-                y=yearly_revenue["Total Revenue"].astype(float),
+                x=view.yearly_revenue["Year"],
+                y=view.yearly_revenue["Total Revenue"].astype(float),
                 name="Yearly Sales",
                 marker=dict(
-                    color=yearly_revenue["Total Revenue"].astype(float),
+                    color=view.yearly_revenue["Total Revenue"].astype(float),
                     colorscale="Viridis",
                 ),
-                hoverinfo="y+text",
-                text=[
-                    f"Year: {year}<br>Total Revenue: ${revenue:.2f}"
-                    for year, revenue in zip(
-                        yearly_revenue["Year"],
-                        yearly_revenue["Total Revenue"].astype(float),
-                    )
-                ],
+                **point_text("Year: %{x}<br>Total Revenue: $%{y:.2f}"),
             )
         )
         fig.update_layout(
@@ -851,13 +812,16 @@ def update_sales_trend(selected_trend):
             ),
             bargap=0.2,
         )
-        graphs.append(dcc.Graph(figure=fig))
+        figures.append(fig.to_dict())
     elif selected_trend == "region_country":
         region_country_fig = go.Figure()
-        for region in region_country_revenue["Region"].unique():
-            region_data = region_country_revenue[
-                region_country_revenue["Region"] == region
-            ]
+        for region in view.region_country_revenue["Region"].unique():
+            region_data = top_n(
+                view.region_country_revenue[
+                    view.region_country_revenue["Region"] == region
+                ],
+                "Total Revenue",
+            )
             region_country_fig.add_trace(
                 go.Bar(
                     x=region_data["Country"],
@@ -866,13 +830,12 @@ def update_sales_trend(selected_trend):
                     marker=dict(
                         color=region_data["Total Revenue"], colorscale="Viridis"
                     ),
-                    hoverinfo="y+text",
-                    text=[
-                        f"Region: {region}<br>Country: {country}<br>Total Revenue: ${revenue:.2f}"
-                        for country, revenue in zip(
-                            region_data["Country"], region_data["Total Revenue"]
-                        )
-                    ],
+                    # The region is fixed per trace, so it goes into the
+                    # template rather than into every point.
+                    **point_text(
+                        f"Region: {region}<br>Country: %{{x}}<br>"
+                        "Total Revenue: $%{y:.2f}"
+                    ),
                 )
             )
         region_country_fig.update_layout(
@@ -887,14 +850,405 @@ def update_sales_trend(selected_trend):
             ),
             bargap=0.2,
         )
-        graphs.append(dcc.Graph(figure=region_country_fig))
-    return graphs
+        figures.append(region_country_fig.to_dict())
+    return figures
+
+
+trend_options = [
+    {"label": "Monthly Sales by Year", "value": "monthly-by-year"},
+    {"label": "Monthly Sales Trends", "value": "monthly"},
+    {"label": "Yearly Sales Trends", "value": "yearly"},
+    {"label": "Sales by Region and Country", "value": "region_country"},
+]
+
+
+class DataVersion:
+    # Everything served that is derived from one state of the source file:
+    # the cleaned rows, the aggregate store, the headline numbers, the figure
+    # bundle and the page layout. A new version is built whole beside the
+    # one being served and replaces it with a single assignment, so requests
+    # see either the old data or the new, never a mix.
+    def __init__(self, source=SOURCE_PATH, outlier_rules=None):
+        with stage("load_data"):
+            self.aggregates = load_store(source, outlier_rules=outlier_rules)
+        self.cdf = self.aggregates.data
+        self.sales_query = SalesQuery(self.aggregates)
+        self.no_filter = filter_key(version=self)
+
+        with stage("overall_view"):
+            self.overall = sales_view(self.no_filter)
+        self.monthly_revenue = self.overall.monthly_revenue
+        self.yearly_revenue = self.overall.yearly_revenue
+
+        self.cube = cube = self.aggregates.cube
+        (
+            self.total_revenue,
+            self.total_profit,
+            self.total_units_sold,
+            self.average_order_value,
+            self.profit_margin,
+        ) = calculate_sales_metrics(cube)
+        self.region_performance, self.country_performance = (
+            regional_and_country_performance(cube)
+        )
+        self.item_performance, self.sales_channel_revenue = (
+            product_and_sales_channel_insights(cube)
+        )
+        self.order_priority_revenue, self.average_shipping_time = (
+            order_and_shipping_efficiency(cube)
+        )
+        self.correlation_matrix = self.overall.correlation_matrix
+        self.findings = correlation_findings(self.correlation_matrix)
+
+        # Unfiltered figures never change for a given dataset: they are
+        # rendered once into compressed files the browser fetches and caches,
+        # and only filtered views go through the server callbacks.
+        with stage("figure_bundle"):
+            self.figure_bundle = load_bundle(
+                data_version(self.aggregates), self.render_bundle
+            )
+
+        self.filter_options = {
+            col: sorted(cube.cells[col].unique()) for col in filter_cols
+        }
+        self.first_order_date = day_date(self.cdf["Order Date"].min())
+        self.last_order_date = day_date(self.cdf["Order Date"].max())
+        self.layout = page_layout(self)
+
+    def render_bundle(self):
+        return {
+            **{name: figures.figure(name, self.no_filter) for name in figures.builders},
+            **{
+                f"trend:{option['value']}": sales_trend_figures(
+                    option["value"], self.no_filter
+                )
+                for option in trend_options
+            },
+        }
+
+
+def page_layout(version):
+    overall = version.overall
+    filter_options = version.filter_options
+    first_order_date = version.first_order_date
+    last_order_date = version.last_order_date
+    monthly_revenue = version.monthly_revenue
+    yearly_revenue = version.yearly_revenue
+    total_revenue = version.total_revenue
+    total_profit = version.total_profit
+    profit_margin = version.profit_margin
+    total_units_sold = version.total_units_sold
+    return html.Div(
+        [
+            html.Div([html.H1("Amazon Sales Analysis")], id="header-container"),
+            html.Div(
+                [
+                    dcc.Dropdown(
+                        id="region-filter",
+                        options=filter_options["Region"],
+                        multi=True,
+                        placeholder="All regions",
+                        className="filter",
+                    ),
+                    dcc.Dropdown(
+                        id="item-filter",
+                        options=filter_options["Item Type"],
+                        multi=True,
+                        placeholder="All item types",
+                        className="filter",
+                    ),
+                    dcc.Dropdown(
+                        id="channel-filter",
+                        options=filter_options["Sales Channel"],
+                        multi=True,
+                        placeholder="All sales channels",
+                        className="filter",
+                    ),
+                    dcc.DatePickerRange(
+                        id="date-filter",
+                        min_date_allowed=first_order_date,
+                        max_date_allowed=last_order_date,
+                        initial_visible_month=first_order_date,
+                        clearable=True,
+                    ),
+                ],
+                id="filters-container",
+            ),
+            #! ----             ----                ----                ----                ----
+            # * 1. Overview
+            html.Div(
+                [
+                    html.H2("1. Overview"),
+                    html.P("Quick snippets of the analysis.", className="hed sub-hed"),
+                    html.Div(
+                        [
+                            html.Div(overview_metrics(overall), id="overview-metrics"),
+                            html.Div(
+                                [
+                                    html.H3("5. Quick Visuals", className="hed"),
+                                    html.P(
+                                        "Here are the visualizations from the analysis",
+                                        className="hed sub-hed",
+                                    ),
+                                    dcc.Graph(id="monthly-trends"),
+                                    dcc.Graph(id="monthly-revenue-change"),
+                                    dcc.Graph(id="yearly-trends"),
+                                    dcc.Graph(id="yearly-revenue-change"),
+                                    dcc.Graph(id="monthly-high-low"),
+                                    dcc.Graph(id="yearly-high-low"),
+                                ],
+                                className="ins-con",
+                            ),
+                        ],
+                        className="insights-container",
+                    ),
+                ],
+                id="overview-container",
+            ),
+            #! ----             ----                ----                ----                ----
+            # * 2. Monthly & Yearly Sales Distribution
+            html.Div(
+                [
+                    html.H2("2. Monthly & Yearly Sales Distribution"),
+                    html.P(
+                        "Hover over the segments to see detailed revenue and percentage contribution.",
+                        className="hed sub-hed",
+                    ),
+                    dcc.Graph(id="monthly-distribution"),
+                    paged_table(
+                        "monthly-revenue-table",
+                        overall.data_tables["monthly-revenue-table"],
+                        style_table={"overflowX": "auto"},
+                        style_header={
+                            "backgroundColor": "rgb(230, 230, 230)",
+                            "fontWeight": "bold",
+                        },
+                        style_cell={"textAlign": "center", "padding": "5px"},
+                        page_size=100,
+                    ),
+                    dcc.Graph(id="yearly-distribution"),
+                    paged_table(
+                        "yearly-revenue-table",
+                        overall.data_tables["yearly-revenue-table"],
+                        style_table={"overflowX": "auto"},
+                        style_header={
+                            "backgroundColor": "rgb(230, 230, 230)",
+                            "fontWeight": "bold",
+                        },
+                        style_cell={"textAlign": "center", "padding": "5px"},
+                        page_size=100,
+                    ),
+                ],
+                id="sales-distribution-container",
+            ),
+            #! ----             ----                ----                ----                ----
+            # * 3. Sales Trends
+            html.Div(
+                [
+                    html.H2("3. Sales Trends"),
+                    html.P(
+                        "Choose the option from the dropdown list below to see detailed information of Monthly by year, Monthly, Yearly and Regionally sales trend data.",
+                        className="hed sub-hed",
+                    ),
+                    dcc.Dropdown(
+                        id="sales-trend-dropdown",
+                        options=trend_options,
+                        value="monthly-by-year",
+                        className="dash-dropdown sub-hed",
+                    ),
+                    html.Div(id="sales-trends"),
+                ],
+                id="sales-trend-container",
+            ),
+            #! ----             ----                ----                ----                ----
+            # * 4. Correlation Matrix
+            html.Div(
+                [
+                    html.H2("4. Correlation Matrix"),
+                    html.P(
+                        "",
+                        className="hed sub-hed",
+                    ),
+                    dcc.Graph(id="correlation"),
+                    html.H3(
+                        "Findings from Correlation Matrix",
+                        className="hed",
+                    ),
+                    html.Ul(finding_items(version.findings), id="correlation-findings"),
+                ],
+                className="correlations-container",
+            ),
+            #! ----             ----                ----                ----                ----
+            # * 5. Conclusion & Findings
+            html.Div(
+                [
+                    html.H2("5. Conclusion & Findings"),
+                    html.P(
+                        "Based on the analysis of the sales data, we can draw the following conclusions:",
+                        className="hed sub-hed",
+                    ),
+                    html.Ul(
+                        [
+                            html.Li(
+                                f"The total revenue generated over the analyzed period is ${total_revenue:,.2f}."
+                            ),
+                            html.Li(
+                                f"The total profit earned is ${total_profit:,.2f}%, indicating a profit margin of {profit_margin:.2f}%."
+                            ),
+                            html.Li(
+                                f"A total of {total_units_sold:,} units were sold, demonstrating strong sales volume."
+                            ),
+                            html.Li(
+                                f"The highest monthly sales occurred in Month {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmax()]['Month']} of Year {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmax()]['Year']}."
+                            ),
+                            html.Li(
+                                f"The lowest monthly sales were recorded in Month {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmin()]['Month']} of Year {monthly_revenue.loc[monthly_revenue['Total Revenue'].astype(float).idxmin()]['Year']}."
+                            ),
+                            html.Li(
+                                f"The overall trend shows a significant increase in sales year-over-year, with Year {yearly_revenue.loc[yearly_revenue['Total Revenue'].astype(float).idxmax()]['Year']} having the highest revenue."
+                            ),
+                            html.Li(
+                                f"The overall trend shows a significant decrease in sales year-over-year, with Year {yearly_revenue.loc[yearly_revenue['Total Revenue'].astype(float).idxmin()]['Year']} having the lowest revenue."
+                            ),
+                        ]
+                    ),
+                ],
+                id="conclusion-container",
+            ),
+            dcc.Store(id="figure-bundle", data=version.figure_bundle),
+        ],
+        id="main-container",
+    )
+
+
+def swap(version):
+    global current
+    old, current = current, version
+    # Cached views and figures of the old version are never asked for again;
+    # dropping them lets it be freed once requests still using it finish.
+    sales_view.cache_discard(lambda args: args[0][0] is old)
+    sales_trend_figures.cache_discard(lambda args: args[1][0] is old)
+    figures.discard(lambda key: key[0] is old)
+
+
+def __getattr__(name):
+    # The module-level names of the version being served (eda.cube,
+    # eda.total_revenue, ...), for scripts and notebooks importing eda.
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return getattr(current, name)
+
+
+reloader = Reloader(SOURCE_PATH, DataVersion, swap)
+current = DataVersion()
+
+app = Dash(__name__, title="Amazon Sales Analysis")
+serve_bundle(app.server)
+instrument(app.server, app.callback_map)
+
+app.layout = lambda: current.layout
+
+filter_inputs = [
+    Input("region-filter", "value"),
+    Input("item-filter", "value"),
+    Input("channel-filter", "value"),
+    Input("date-filter", "start_date"),
+    Input("date-filter", "end_date"),
+]
+
+
+@app.callback(
+    Output("overview-metrics", "children"),
+    *filter_inputs,
+)
+def update_overview(*filters):
+    return overview_metrics(sales_view(filter_key(*filters)))
+
+
+app.clientside_callback(
+    ClientsideFunction("figures", "trends"),
+    Output("sales-trends", "children"),
+    Input("sales-trend-dropdown", "value"),
+    *filter_inputs,
+    State("figure-bundle", "data"),
+)
+
+
+@app.callback(
+    Output("sales-trends", "children", allow_duplicate=True),
+    Input("sales-trend-dropdown", "value"),
+    *filter_inputs,
+    prevent_initial_call=True,
+)
+def update_sales_trend(selected_trend, *filters):
+    key = filter_key(*filters)
+    if key == key[0].no_filter:
+        raise PreventUpdate
+    return [dcc.Graph(figure=fig) for fig in sales_trend_figures(selected_trend, key)]
+
+
+def register_section_callback(section):
+    names = figures.sections[section]
+    app.clientside_callback(
+        ClientsideFunction("figures", "section"),
+        [Output(name, "figure") for name in names],
+        *filter_inputs,
+        State("figure-bundle", "data"),
+    )
+
+    @app.callback(
+        [Output(name, "figure", allow_duplicate=True) for name in names],
+        *filter_inputs,
+        prevent_initial_call=True,
+    )
+    def render_section(*filters):
+        key = filter_key(*filters)
+        if key == key[0].no_filter:
+            raise PreventUpdate
+        return figures.section(section, key)
+
+
+for section in figures.sections:
+    register_section_callback(section)
+
+
+# The findings follow the filters like the heatmap above them; unfiltered
+# they are in the layout already.
+@app.callback(
+    Output("correlation-findings", "children"),
+    *filter_inputs,
+    prevent_initial_call=True,
+)
+def update_findings(*filters):
+    view = sales_view(filter_key(*filters))
+    return finding_items(correlation_findings(view.correlation_matrix))
+
+
+def register_table_callback(table_id):
+    @app.callback(
+        Output(table_id, "data"),
+        Output(table_id, "page_count"),
+        Input(table_id, "page_current"),
+        Input(table_id, "page_size"),
+        Input(table_id, "sort_by"),
+        Input(table_id, "filter_query"),
+        *filter_inputs,
+    )
+    def update_table(page_current, page_size, sort_by, filter_query, *filters):
+        table = sales_view(filter_key(*filters)).data_tables[table_id]
+        return table.page(page_current, page_size, sort_by, filter_query)
+
+
+for table_id in current.overall.data_tables:
+    register_table_callback(table_id)
 
 
 def open_in_browser(app):
+    # Development server only; production serving goes through wsgi.py.
     Timer(1, lambda: wb.open("http://127.0.0.1:8050/")).start()
     app.run_server(debug=False, port=8050, host="0.0.0.0")
 
 
 if __name__ == "__main__":
+    reloader.start()
     open_in_browser(app)
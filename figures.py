@@ -0,0 +1,44 @@
+from memo import memoize
+from metrics import figure_seconds, timer
+
+
+class FigureRegistry:
+    # Figures are registered as builder functions and only built (and turned
+    # into plain dicts) the first time their dashboard section asks for them.
+    # Builders draw from view(key), the data for one filter key, and figures
+    # are cached per name and key.
+    def __init__(self, view):
+        self.view = view
+        self.builders = {}
+        self.sections = {}
+        self.figure = memoize(maxsize=256)(self.build)
+
+    def register(self, name, section=None):
+        def decorator(func):
+            self.builders[name] = func
+            if section is not None:
+                self.sections.setdefault(section, []).append(name)
+            return func
+
+        return decorator
+
+    def build(self, name, key):
+        with timer(figure_seconds, figure=name):
+            return self.builders[name](self.view(key)).to_dict()
+
+    def section(self, section, key):
+        return [self.figure(name, key) for name in self.sections[section]]
+
+    def clear(self):
+        self.figure.cache_clear()
+
+    def discard(self, match):
+        # Drops the cached figures of the keys match(key) is true for.
+        self.figure.cache_discard(lambda args: match(args[1]))
+
+
+def point_text(template):
+    # Bar and hover text for every point of a trace, filled in by plotly.js
+    # from x, y, label, value and customdata rather than formatted in Python
+    # one string per point.
+    return dict(texttemplate=template, hovertemplate=template + "<extra></extra>")
@@ -0,0 +1,37 @@
+import gc
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get("EDA_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("EDA_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("EDA_THREADS", 4))
+timeout = 120
+
+# Load eda.py once in the master so every worker shares the same pages: the
+# dataset columns are copy-on-write memory maps of the on-disk cache, and the
+# rest of the heap is inherited copy-on-write.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching (and so copying) every
+    # object inherited from the master.
+    gc.freeze()
+
+
+def when_ready(server):
+    # The source watcher runs in the master alone, so a change is rebuilt
+    # once rather than by every worker. The master swaps the new version in
+    # for itself and sends itself a HUP: with preload_app the app is not
+    # imported again, so the new workers are forks of the master sharing the
+    # new version's pages, while the old ones finish their requests and
+    # exit.
+    import eda
+
+    def swap(version):
+        eda.swap(version)
+        os.kill(server.pid, signal.SIGHUP)
+
+    eda.reloader.swap = swap
+    eda.reloader.start()
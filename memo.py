@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+def memoize(maxsize=128, ttl=None):
+    # LRU cache with an optional time-to-live, safe to share between the
+    # threads of a multi-threaded server.
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args):
+            now = time.monotonic()
+            with lock:
+                hit = cache.get(args)
+                if hit is not None and (ttl is None or now - hit[0] < ttl):
+                    cache.move_to_end(args)
+                    return hit[1]
+            value = func(*args)
+            with lock:
+                cache[args] = (now, value)
+                cache.move_to_end(args)
+                while maxsize is not None and len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        def cache_discard(match):
+            # Drops the entries whose arguments match(args) is true for.
+            with lock:
+                for args in [args for args in cache if match(args)]:
+                    del cache[args]
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_discard = cache_discard
+        return wrapper
+
+    return decorator
@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+
+# Seconds; spans a cached callback (milliseconds) to a cold figure build.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The metrics and profile endpoints answer these client addresses only.
+ALLOWED_HOSTS = set(os.environ.get("EDA_METRICS_ALLOW", "127.0.0.1,::1").split(","))
+
+# Set EDA_PROFILER=1 to enable /debug/profile.
+PROFILER = os.environ.get("EDA_PROFILER") == "1"
+
+registry = []
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    # One metric family, a value per label set, in the Prometheus text
+    # exposition format. Each process keeps its own; under gunicorn a scrape
+    # sees the worker that answered it.
+    kind = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in sorted(values):
+            for name, sample_labels, sample in self.samples(labels, value):
+                yield f"{name}{label_text(sample_labels)} {sample:g}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=BUCKETS):
+        super().__init__(name, help)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts = self.values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self, labels, counts):
+        for bound, count in zip(self.buckets, counts):
+            yield f"{self.name}_bucket", labels + (("le", f"{bound:g}"),), count
+        yield f"{self.name}_bucket", labels + (("le", "+Inf"),), counts[-2]
+        yield f"{self.name}_count", labels, counts[-2]
+        yield f"{self.name}_sum", labels, counts[-1]
+
+
+stage_seconds = Gauge(
+    "eda_stage_seconds", "Duration of the last run of each data preparation stage."
+)
+callback_seconds = Histogram(
+    "eda_callback_seconds", "Dash callback latency, including serialization."
+)
+callback_bytes = Counter(
+    "eda_callback_response_bytes_total", "Bytes sent in Dash callback responses."
+)
+figure_seconds = Histogram(
+    "eda_figure_build_seconds", "Time to build a figure and turn it into a dict."
+)
+reloads = Counter(
+    "eda_reloads_total", "Data reloads after a source change, by outcome."
+)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.set(time.perf_counter() - start, stage=name)
+
+
+@contextmanager
+def timer(histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def exposition():
+    return "\n".join(line for metric in registry for line in metric.lines()) + "\n"
+
+
+def sample_stacks(seconds, interval=0.005):
+    # Samples the stack of every other thread, and returns them folded, one
+    # "outermost;...;innermost count" line per distinct stack: the input of
+    # flamegraph.pl and speedscope.
+    me = threading.get_ident()
+    counts = {}
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def instrument(server, callbacks):
+    # Times every Dash callback request by its outputs, and serves the
+    # metrics (and, opted in, the profiler) to local clients. callbacks is
+    # the app's callback map, read per request as callbacks are registered
+    # after this.
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        if request.path.endswith("/_dash-update-component"):
+            body = request.get_json(silent=True)
+            output = body.get("output") if isinstance(body, dict) else None
+            # The output comes from the client: only registered callbacks get
+            # a series of their own, so made-up names cannot grow the
+            # registry. Duplicate outputs carry an @<hash> suffix per
+            # callback; the output names are label enough.
+            callback = "unknown"
+            if isinstance(output, str) and output in callbacks:
+                callback = re.sub(r"@[0-9a-f]+", "", output)
+            callback_seconds.observe(
+                time.perf_counter() - g.metrics_start, callback=callback
+            )
+            callback_bytes.inc(response.content_length or 0, callback=callback)
+        return response
+
+    @server.route("/metrics")
+    def metrics_page():
+        if request.remote_addr not in ALLOWED_HOSTS:
+            abort(404)
+        return Response(exposition(), mimetype="text/plain; version=0.0.4")
+
+    @server.route("/debug/profile")
+    def profile():
+        if not PROFILER or request.remote_addr not in ALLOWED_HOSTS:
+            abort(404)
+        seconds = min(float(request.args.get("seconds", 10)), 60)
+        return Response(sample_stacks(seconds), mimetype="text/plain")
@@ -0,0 +1,77 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain, islice
+
+PROCESSES = int(os.environ.get("EDA_PROCESSES", os.cpu_count() or 1))
+
+
+@contextmanager
+def process_pool(processes=PROCESSES):
+    # A pool for map_chunks and TreeMerge to share, or None when there is
+    # only one process and the work runs in-process.
+    if processes <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        yield pool
+
+
+def map_chunks(func, chunks, *args, processes=PROCESSES, pool=None):
+    # Yields func(chunk, *args) for each chunk, in input order. Chunks are
+    # fanned out to a process pool with at most two per process in flight,
+    # so a large file is never held in memory at once; a lone chunk is
+    # handled in-process rather than paying for a pool, unless one is given.
+    chunks = iter(chunks)
+    head = list(islice(chunks, 2))
+    if pool is None and (processes <= 1 or len(head) < 2):
+        for chunk in chain(head, chunks):
+            yield func(chunk, *args)
+        return
+    with process_pool(processes) if pool is None else nullcontext(pool) as pool:
+        pending = deque()
+        for chunk in chain(head, chunks):
+            pending.append(pool.submit(func, chunk, *args))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class TreeMerge:
+    # Merges results as they arrive, like carries in a binary counter: a
+    # result only meets ones built from as many chunks, so at most about
+    # log2(n) wait at once, and with a pool each merge runs in a pool
+    # process while the next chunks are worked on. What is merged with what
+    # depends only on the order results arrive in, so the merged result is
+    # the same however many processes there are.
+    def __init__(self, merge, pool=None):
+        self.merge = merge
+        self.pool = pool
+        # (chunks merged, result or Future) from the oldest chunks on.
+        self.stack = []
+
+    def add(self, item):
+        size, items = 1, [item]
+        while self.stack and self.stack[-1][0] == size:
+            items.insert(0, self.stack.pop()[1])
+            size *= 2
+        if len(items) > 1:
+            items = [
+                other.result() if isinstance(other, Future) else other
+                for other in items
+            ]
+            if self.pool is None:
+                item = self.merge(items)
+            else:
+                item = self.pool.submit(self.merge, items)
+        self.stack.append((size, item))
+
+    def result(self):
+        items = [
+            item.result() if isinstance(item, Future) else item
+            for _, item in self.stack
+        ]
+        self.stack = []
+        return items[0] if len(items) == 1 else self.merge(items)
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from flask import Response, abort, request
+from plotly.io.json import to_json_plotly
+
+from cache import CACHE_VERSION
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FIGURE_DIR = os.environ.get("EDA_FIGURE_DIR", "assets/.figures")
+URL_PATH = "/_figures/"
+
+# Bump whenever the figure builders change so stale bundles are re-rendered.
+BUNDLE_VERSION = 3
+
+# Files are named by the hash of their content, so a URL never changes
+# meaning and browsers can keep it for good.
+MAX_AGE = 365 * 24 * 3600
+
+
+def data_version(store):
+    # The figures depend on the source content, the cleaning settings the
+    # aggregate store was built with and the deltas ingested since.
+    key = json.dumps(
+        [
+            CACHE_VERSION,
+            BUNDLE_VERSION,
+            store.source["sha256"],
+            store.settings,
+            store.deltas,
+        ]
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def write_bundle(figures, root):
+    # One compressed JSON file per figure (or list of figures), plus a
+    # manifest of their content hashes. Written to a side directory and
+    # renamed into place, so readers never see half a bundle.
+    tmp = root + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    manifest = {}
+    for name, figure in figures.items():
+        body = to_json_plotly(figure).encode()
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        path = os.path.join(tmp, digest + ".json")
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(body, 9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(body))
+        manifest[name] = digest
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(tmp, root)
+    return manifest
+
+
+def load_bundle(version, build, figure_dir=FIGURE_DIR):
+    # Maps each figure name to the URL of its pre-rendered JSON, rendering
+    # the bundle with build() when this data version has none yet.
+    root = os.path.join(figure_dir, version)
+    try:
+        with open(os.path.join(root, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = write_bundle(build(), root)
+        # Pages loaded before a data reload still point at the previous
+        # bundle, so the newest other version is kept for them.
+        others = sorted(
+            (entry for entry in os.listdir(figure_dir) if entry != version),
+            key=lambda entry: os.path.getmtime(os.path.join(figure_dir, entry)),
+        )
+        for entry in others[:-1]:
+            shutil.rmtree(os.path.join(figure_dir, entry), ignore_errors=True)
+    return {
+        name: f"{URL_PATH}{version}/{digest}.json" for name, digest in manifest.items()
+    }
+
+
+def bundle_files(version, figure_dir=FIGURE_DIR):
+    # The compressed JSON file of each figure of a rendered bundle, by name.
+    root = os.path.join(figure_dir, version)
+    with open(os.path.join(root, "manifest.json")) as f:
+        manifest = json.load(f)
+    return {
+        name: os.path.join(root, digest + ".json.gz")
+        for name, digest in manifest.items()
+    }
+
+
+def serve_bundle(server, figure_dir=FIGURE_DIR):
+    @server.route(URL_PATH + "<version>/<digest>.json")
+    def bundle_file(version, digest):
+        if not (version.isalnum() and digest.isalnum()):
+            abort(404)
+        path = os.path.join(figure_dir, version, digest + ".json")
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if request.accept_encodings.quality(encoding) and os.path.exists(
+                path + suffix
+            ):
+                break
+        else:
+            encoding = None
+        try:
+            with open(path + (".gz" if encoding is None else suffix), "rb") as f:
+                body = f.read()
+        except OSError:
+            abort(404)
+
+        if encoding is None:
+            body = gzip.decompress(body)
+        response = Response(body, mimetype="application/json")
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE
+        response.cache_control.immutable = True
+        response.set_etag(digest if encoding is None else f"{digest}.{encoding}")
+        return response.make_conditional(request)
@@ -0,0 +1,309 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import BLOCK_ROWS
+from correlation import CoMoments, moments
+from cube import SalesCube, month_sketch_cols, sketch_cols, sketch_values
+from sketches import KLLSketch
+
+filter_cols = ["Region", "Item Type", "Sales Channel"]
+
+
+def day_number(date):
+    # Dash date pickers send "YYYY-MM-DD", sometimes with a time appended.
+    return int(np.datetime64(date[:10], "D").astype(np.int64))
+
+
+def month_of(day):
+    return int(np.datetime64(day, "D").astype("datetime64[M]").astype(np.int64))
+
+
+def month_start(month):
+    return int(np.datetime64(month, "M").astype("datetime64[D]").astype(np.int64))
+
+
+def year_of(day):
+    return int(np.datetime64(day, "D").astype("datetime64[Y]").astype(np.int64)) + 1970
+
+
+def year_start(year):
+    return int(np.datetime64(year - 1970, "Y").astype("datetime64[D]").astype(np.int64))
+
+
+def whole_periods(lo, hi, period_of, period_start):
+    # Splits the day range [lo, hi] into the periods (months, years) lying
+    # wholly inside it and the leftover day ranges at either end. Returns
+    # None for the periods when not one whole period fits.
+    first = None if lo is None else period_of(lo) + (period_start(period_of(lo)) < lo)
+    last = (
+        None
+        if hi is None
+        else period_of(hi) - (period_start(period_of(hi) + 1) - 1 > hi)
+    )
+    if first is not None and last is not None and first > last:
+        return None, [(lo, hi)]
+    edges = []
+    if lo is not None:
+        edges.append((lo, period_start(first) - 1))
+    if hi is not None:
+        edges.append((period_start(last + 1), hi))
+    return (first, last), edges
+
+
+def year_key(values):
+    return values["Year"]
+
+
+def month_key(values):
+    return (int(values["Year"]) - 1970) * 12 + int(values["Month"]) - 1
+
+
+def keys_between(keyed, cols, filters, period, first=None, last=None):
+    # The keys of keyed (sketches or co-moments, keyed by cols) whose period
+    # lies in [first, last] and whose filter columns hold allowed values.
+    keys = []
+    for key in keyed:
+        values = dict(zip(cols, key))
+        if first is not None and period(values) < first:
+            continue
+        if last is not None and period(values) > last:
+            continue
+        if all(values[col] in allowed for col, allowed in filters.items()):
+            keys.append(key)
+    return keys
+
+
+def postings(values):
+    # Inverted index over one column: the positions holding each value, in
+    # ascending order, as slices of a single stable argsort.
+    codes, uniques = pd.factorize(values, sort=True)
+    order = np.argsort(codes, kind="stable")
+    offsets = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {
+        value: order[offsets[i] : offsets[i + 1]] for i, value in enumerate(uniques)
+    }
+
+
+class SortedIndex:
+    # Positions ordered by key, so the rows inside a key range are one
+    # contiguous slice found with two binary searches.
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def between(self, lo=None, hi=None):
+        start = 0 if lo is None else np.searchsorted(self.keys, lo, "left")
+        stop = len(self.keys) if hi is None else np.searchsorted(self.keys, hi, "right")
+        return np.sort(self.order[start:stop])
+
+
+class DayIndex:
+    # Row positions grouped by order day: a counting sort built in two
+    # streaming passes over the day numbers. The positions are memory-mapped
+    # from a file, so the index adds no resident memory on large data, and
+    # processes mapping the same file share its pages. first_row is the
+    # frame position of the first row indexed.
+    def __init__(self, first, offsets, order, first_row=0):
+        self.first = first
+        self.offsets = offsets
+        self.order = order
+        self.first_row = first_row
+
+    @classmethod
+    def build(cls, dates, path, block_rows=BLOCK_ROWS, first_row=0):
+        # Writes the positions to path as a .npy file, through a temporary
+        # file so a process still mapping an older one keeps it whole.
+        dates = dates.to_numpy()
+        first = 0
+        counts = np.zeros(0, dtype=np.int64)
+        if len(dates):
+            first = int(dates.min())
+            last = int(dates.max())
+            counts = np.zeros(last - first + 1, dtype=np.int64)
+        blocks = range(0, len(dates), block_rows)
+
+        def days(start):
+            return dates[start : start + block_rows].astype(np.int64) - first
+
+        for start in blocks:
+            counts += np.bincount(days(start), minlength=len(counts))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        dtype = np.uint32 if len(dates) <= np.iinfo(np.uint32).max else np.int64
+        tmp = path + ".tmp.npy"
+        positions = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=dtype, shape=(len(dates),)
+        )
+        fill = offsets[:-1].copy()
+        for start in blocks:
+            block = days(start)
+            order = np.argsort(block, kind="stable")
+            sorted_days = block[order]
+            block_counts = np.bincount(block, minlength=len(counts))
+            rank = (
+                np.arange(len(block))
+                - (np.cumsum(block_counts) - block_counts)[sorted_days]
+            )
+            positions[fill[sorted_days] + rank] = start + order
+            fill += block_counts
+        positions.flush()
+        os.replace(tmp, path)
+        return cls(first, offsets, positions, first_row)
+
+    def between(self, lo=None, hi=None):
+        n_days = len(self.offsets) - 1
+        start = 0 if lo is None else min(max(lo - self.first, 0), n_days)
+        stop = n_days if hi is None else min(max(hi - self.first + 1, 0), n_days)
+        positions = self.order[self.offsets[start] : self.offsets[max(start, stop)]]
+        return np.sort(positions.astype(np.int64)) + self.first_row
+
+
+class DayIndexes:
+    # Day indexes over consecutive runs of the frame's rows, one per append,
+    # so appending a delta indexes only its own rows. Each run's positions
+    # are sorted and lie past the previous run's, so joining them keeps the
+    # order.
+    def __init__(self, parts):
+        self.parts = parts
+
+    def between(self, lo=None, hi=None):
+        return np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [part.between(lo, hi) for part in self.parts]
+        )
+
+
+class SalesQuery:
+    # Filtered views of the sales cube without a scan per request. Cube cells
+    # are picked through per-column postings and a month index; only the
+    # orders in the partial first and last month of a date range are read
+    # from the row data, through the store's day index. Quantile sketches,
+    # and the co-moments correlations are computed from, are kept per year
+    # and per month: whole years of a date range come from the yearly keys,
+    # whole months of its partial first and last year from the monthly
+    # ones, and only the days of partial months from the rows. The postings
+    # are built by the first query needing them, so an unfiltered dashboard
+    # starts without them.
+    def __init__(self, store):
+        self.cube = cube = store.cube
+        self.sketches = store.sketches
+        self.moments = store.moments
+        self.month_sketches = store.month_sketches
+        self.month_moments = store.month_moments
+        self.data = store.data
+        self.days = store.days
+        cells = cube.cells
+        self.postings = {}
+        self.months = SortedIndex(
+            (cells["Year"].to_numpy(np.int64) - 1970) * 12
+            + cells["Month"].to_numpy(np.int64)
+            - 1
+        )
+
+    def column_postings(self, col):
+        if col not in self.postings:
+            self.postings[col] = postings(self.cube.cells[col])
+        return self.postings[col]
+
+    def cells(self, filters, first=None, last=None):
+        parts = [
+            np.sort(
+                np.concatenate(
+                    [self.column_postings(col).get(value, []) for value in values]
+                ).astype(np.int64)
+            )
+            for col, values in filters.items()
+        ]
+        if first is not None or last is not None:
+            parts.append(self.months.between(first, last))
+        if not parts:
+            return self.cube.cells
+        parts.sort(key=len)
+        rows = parts[0]
+        for part in parts[1:]:
+            rows = np.intersect1d(rows, part, assume_unique=True)
+        return self.cube.cells.iloc[rows]
+
+    def orders(self, filters, lo, hi):
+        data = self.data.iloc[self.days.between(lo, hi)]
+        for col, values in filters.items():
+            data = data[data[col].isin(values)]
+        return data
+
+    def slice(self, filters, start=None, end=None):
+        filters = {col: values for col, values in filters.items() if values}
+        lo = None if start is None else day_number(start)
+        hi = None if end is None else day_number(end)
+        if lo is None and hi is None:
+            return SalesCube(self.cells(filters)) if filters else self.cube
+
+        # Months lying wholly inside the range come straight from the cube.
+        months, edges = whole_periods(lo, hi, month_of, month_start)
+        if months is None:
+            cells = [self.cube.cells.iloc[:0]]
+        else:
+            cells = [self.cells(filters, *months)]
+
+        # Edge cells are appended rather than merged: every view of a slice
+        # is a roll-up, which adds up repeated cells anyway.
+        for lo, hi in edges:
+            orders = self.orders(filters, lo, hi)
+            if len(orders):
+                cells.append(SalesCube.from_frame(orders).cells)
+        return SalesCube(pd.concat(cells, ignore_index=True))
+
+    def period_keys(self, yearly, monthly, filters, start, end):
+        # The keys of yearly and monthly (sketches or co-moments) lying
+        # wholly inside the filters and [start, end], plus the day ranges at
+        # either end that have to be read from the rows.
+        lo = None if start is None else day_number(start)
+        hi = None if end is None else day_number(end)
+        if lo is None and hi is None:
+            return keys_between(yearly, sketch_cols, filters, year_key), [], []
+
+        years, year_edges = whole_periods(lo, hi, year_of, year_start)
+        year_keys = []
+        if years is not None:
+            year_keys = keys_between(yearly, sketch_cols, filters, year_key, *years)
+        month_keys, edges = [], []
+        for lo, hi in year_edges:
+            months, day_edges = whole_periods(lo, hi, month_of, month_start)
+            if months is not None:
+                month_keys += keys_between(
+                    monthly, month_sketch_cols, filters, month_key, *months
+                )
+            edges += day_edges
+        return year_keys, month_keys, edges
+
+    def quantiles(self, filters, start=None, end=None):
+        filters = {col: set(values) for col, values in filters.items() if values}
+        years, months, edges = self.period_keys(
+            self.sketches.sketches, self.month_sketches.sketches, filters, start, end
+        )
+        names = list(sketch_values(self.data.iloc[:0]))
+        merged = self.sketches.merged(years, names)
+        if months:
+            monthly = self.month_sketches.merged(months, names)
+            merged = {
+                name: KLLSketch.combine([merged[name], monthly[name]]) for name in names
+            }
+
+        for lo, hi in edges:
+            values = sketch_values(self.orders(filters, lo, hi))
+            for name in names:
+                edge = KLLSketch()
+                edge.update(values[name])
+                merged[name] = KLLSketch.combine([merged[name], edge])
+        return merged
+
+    def correlation(self, filters, start=None, end=None):
+        filters = {col: set(values) for col, values in filters.items() if values}
+        years, months, edges = self.period_keys(
+            self.moments.moments, self.month_moments.moments, filters, start, end
+        )
+        parts = [self.moments.merged(years), self.month_moments.merged(months)]
+        for lo, hi in edges:
+            parts.append(moments(self.orders(filters, lo, hi)))
+        return CoMoments.combine(parts, self.moments.columns).corr()
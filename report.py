@@ -0,0 +1,226 @@
+import argparse
+import gzip
+import html
+import json
+import os
+import time
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from parallel import PROCESSES, map_chunks
+from prerender import bundle_files, data_version
+
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+REPORT_DIR = os.environ.get("EDA_REPORT_DIR", "report")
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="plotly.min.js"></script>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def growth_rate(revenue):
+    # Mean change from one period to the next, in percent; revenue is in
+    # date order.
+    return float(revenue.astype(float).pct_change().mean() * 100)
+
+
+def ranked(series):
+    return {str(label): float(value) for label, value in series.items()}
+
+
+def summary(version):
+    # The report's numbers, from the insight functions over the version's
+    # cube and the unfiltered view; nothing is read from the row data.
+    from eda import order_distribution
+
+    order_count, countries, median_order_value, p95_order_value, p95_shipping = (
+        order_distribution(version.cube, version.overall.quantiles)
+    )
+    monthly = version.monthly_revenue.set_index(["Year", "Month"])["Total Revenue"]
+    yearly = version.yearly_revenue.set_index("Year")["Total Revenue"]
+    return {
+        "total_revenue": float(version.total_revenue),
+        "total_profit": float(version.total_profit),
+        "total_units_sold": int(version.total_units_sold),
+        "average_order_value": float(version.average_order_value),
+        "profit_margin": float(version.profit_margin),
+        "orders": int(order_count),
+        "countries": int(countries),
+        "median_order_value": float(median_order_value),
+        "p95_order_value": float(p95_order_value),
+        "average_shipping_days": float(version.average_shipping_time),
+        "p95_shipping_days": float(p95_shipping),
+        "top_regions_by_revenue": ranked(version.region_performance),
+        "top_countries_by_profit": ranked(version.country_performance),
+        "top_item_types_by_units": ranked(version.item_performance),
+        "revenue_by_sales_channel": ranked(version.sales_channel_revenue),
+        "revenue_by_order_priority": ranked(version.order_priority_revenue),
+        "monthly_growth_rate": growth_rate(monthly),
+        "yearly_growth_rate": growth_rate(yearly),
+        "highest_month": [int(part) for part in monthly.astype(float).idxmax()],
+        "lowest_month": [int(part) for part in monthly.astype(float).idxmin()],
+        "highest_year": int(yearly.astype(float).idxmax()),
+        "lowest_year": int(yearly.astype(float).idxmin()),
+        "findings": list(version.findings),
+    }
+
+
+def summary_text(numbers):
+    # The summary in the layout of the README's analysis sections.
+    def listing(values, unit="$"):
+        return [
+            f"{rank}. {label}: {unit}{value:,.2f}"
+            for rank, (label, value) in enumerate(values.items(), 1)
+        ]
+
+    lines = [
+        "### Sales Metrics:",
+        f"Total Revenue: ${numbers['total_revenue']:,.2f}",
+        f"Average Order Value: ${numbers['average_order_value']:,.2f}",
+        f"Total Profit: ${numbers['total_profit']:,.2f}",
+        f"Profit Margin: {numbers['profit_margin']:.2f}%",
+        f"Total Units Sold: {numbers['total_units_sold']:,}",
+        "",
+        "### Regional and Country Performance:",
+        "Top 3 Regions by Revenue:",
+        *listing(numbers["top_regions_by_revenue"]),
+        "",
+        "Top 3 Countries by Profit:",
+        *listing(numbers["top_countries_by_profit"]),
+        "",
+        "### Product and Sales Channel:",
+        "Best Selling Items Types:",
+        *[
+            f"{rank}. {label}: {value:,.0f} units"
+            for rank, (label, value) in enumerate(
+                numbers["top_item_types_by_units"].items(), 1
+            )
+        ],
+        "",
+        "Revenue by sales channel:",
+        *listing(numbers["revenue_by_sales_channel"]),
+        "",
+        "### Sales trends",
+        f"Monthly Growth Rate: {numbers['monthly_growth_rate']:.2f}%",
+        f"Yearly Growth Rate: {numbers['yearly_growth_rate']:.2f}%",
+        "",
+        "### Summary",
+        f"• The total revenue generated over the analysed period is "
+        f"${numbers['total_revenue']:,.2f}.",
+        f"• The total Profit is ${numbers['total_profit']:,.2f}.",
+        "• The highest monthly sales occurred in month {1} of year {0}.".format(
+            *numbers["highest_month"]
+        ),
+        "• The lowest monthly sales occurred in month {1} of year {0}.".format(
+            *numbers["lowest_month"]
+        ),
+        f"• Year {numbers['highest_year']} had the highest revenue.",
+        f"• Year {numbers['lowest_year']} had the lowest revenue.",
+        *[f"• {finding}." for finding in numbers["findings"]],
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_entry(entry, out_dir, formats):
+    # Runs in a pool process: one entry of the figure bundle, a figure or a
+    # list of them, to a page and, with kaleido, an image per figure.
+    name, path = entry
+    with open(path, "rb") as f:
+        figures = json.loads(gzip.decompress(f.read()))
+    if isinstance(figures, dict):
+        figures = [figures]
+    stem = name.replace(":", "-")
+    files = []
+    if "html" in formats:
+        body = "\n".join(
+            pio.to_html(fig, include_plotlyjs=False, full_html=False, validate=False)
+            for fig in figures
+        )
+        with open(os.path.join(out_dir, stem + ".html"), "w") as f:
+            f.write(PAGE.format(title=html.escape(name), body=body))
+        files.append(stem + ".html")
+    if "png" in formats:
+        for i, fig in enumerate(figures, 1):
+            file = f"{stem}.png" if len(figures) == 1 else f"{stem}-{i}.png"
+            pio.write_image(fig, os.path.join(out_dir, file), validate=False)
+            files.append(file)
+    return name, files
+
+
+def write_report(out_dir=REPORT_DIR, formats=("html",), processes=PROCESSES):
+    # Loads the data version a server would (from the warm caches when the
+    # source is unchanged) and renders its pre-rendered figure bundle, so
+    # no figure is built again.
+    import eda
+
+    version = eda.current
+    files = bundle_files(data_version(version.aggregates))
+    os.makedirs(out_dir, exist_ok=True)
+    if "html" in formats:
+        with open(os.path.join(out_dir, "plotly.min.js"), "w") as f:
+            f.write(get_plotlyjs())
+    pages = dict(
+        map_chunks(render_entry, files.items(), out_dir, formats, processes=processes)
+    )
+
+    numbers = summary(version)
+    text = summary_text(numbers)
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(numbers, f, indent=1)
+    with open(os.path.join(out_dir, "summary.md"), "w") as f:
+        f.write(text)
+    links = "\n".join(
+        f'<li><a href="{html.escape(file)}">{html.escape(file)}</a></li>'
+        for name in pages
+        for file in pages[name]
+    )
+    with open(os.path.join(out_dir, "index.html"), "w") as f:
+        f.write(
+            PAGE.format(
+                title="Amazon Sales Analysis",
+                body=f"<h1>Amazon Sales Analysis</h1>\n"
+                f"<pre>{html.escape(text)}</pre>\n<ul>\n{links}\n</ul>",
+            )
+        )
+    return pages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the sales report (summary numbers and every figure) "
+        "from the cached data, without starting the dashboard."
+    )
+    parser.add_argument("--output", default=REPORT_DIR, help="report directory")
+    parser.add_argument(
+        "--formats",
+        default="html",
+        help="comma-separated, from html and png (png needs kaleido)",
+    )
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+    if not set(formats) <= {"html", "png"}:
+        parser.error(f"unknown format in {args.formats}")
+    if "png" in formats and kaleido is None:
+        parser.error("png images need the kaleido package")
+
+    start = time.perf_counter()
+    pages = write_report(args.output, formats, args.processes)
+    print(
+        f"wrote {sum(len(files) for files in pages.values())} files to "
+        f"{args.output} in {time.perf_counter() - start:.1f}s"
+    )
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+import traceback
+
+from metrics import reloads, stage
+from store import LOCK_PATH, store_lock
+
+# Seconds between checks of the source file; 0 turns reloading off.
+RELOAD_SECONDS = float(os.environ.get("EDA_RELOAD_SECONDS", 30))
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class Reloader:
+    # Watches the source file from a daemon thread and, once a change has
+    # settled (the file looked the same on two checks in a row), builds a
+    # new data version with build() while the old one keeps serving, then
+    # hands it to swap(). A failed build leaves the old version in place
+    # until the file changes again.
+    def __init__(
+        self, source, build, swap, interval=RELOAD_SECONDS, lock_path=LOCK_PATH
+    ):
+        self.source = source
+        self.build = build
+        self.swap = swap
+        self.interval = interval
+        self.lock_path = lock_path
+        self.stamp = source_stamp(source)
+        self.pending = None
+        self.failed = None
+        self.thread = None
+
+    def check(self):
+        try:
+            stamp = source_stamp(self.source)
+        except OSError:
+            # Mid-replace, or removed; keep serving what there is.
+            return False
+        if stamp in (self.stamp, self.failed):
+            self.pending = None
+            return False
+        if stamp != self.pending:
+            self.pending = stamp
+            return False
+
+        self.pending = None
+        try:
+            with store_lock(self.lock_path), stage("reload"):
+                version = self.build()
+        except Exception:
+            traceback.print_exc()
+            self.failed = stamp
+            reloads.inc(outcome="failed")
+            return False
+        self.swap(version)
+        self.stamp = stamp
+        reloads.inc(outcome="swapped")
+        return True
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def start(self):
+        # Threads do not survive a fork: call this in the process that is to
+        # watch the source, after any forking.
+        if self.interval > 0 and self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name="eda-reloader", daemon=True
+            )
+            self.thread.start()
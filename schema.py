@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Stored as int32 day numbers; see dates.py.
+date_cols = ["Order Date", "Ship Date"]
+
+category_cols = [
+    "Region",
+    "Country",
+    "Item Type",
+    "Sales Channel",
+    "Order Priority",
+]
+
+# Per-order totals reach millions of dollars, where float32 can no longer hold
+# cents, so they stay float64; unit prices and costs are at most a few hundred
+# dollars and fit float32 exactly to the cent.
+SCHEMA = {
+    **{col: "category" for col in category_cols},
+    "Order ID": "uint32",
+    "Order Date": "int32",
+    "Ship Date": "int32",
+    "Units Sold": "int32",
+    "Unit Price": "float32",
+    "Unit Cost": "float32",
+    "Total Revenue": "float64",
+    "Total Cost": "float64",
+    "Total Profit": "float64",
+    "Day": "int8",
+    "Month": "int8",
+    "Year": "int16",
+    "Shipping Days": "int16",
+}
+
+
+def apply_schema(data):
+    for col, dtype in SCHEMA.items():
+        if col not in data.columns or data[col].dtype == dtype:
+            continue
+        values = data[col]
+        if dtype != "category" and np.dtype(dtype).kind in "iu" and len(values):
+            info = np.iinfo(dtype)
+            if (
+                values.isna().any()
+                or values.min() < info.min
+                or values.max() > info.max
+                or (values % 1 != 0).any()
+            ):
+                raise ValueError(f"{col} values do not fit the {dtype} schema type")
+        data[col] = values.astype(dtype)
+    return data
+
+
+def money(values):
+    # Widen float32 money back to float64 at the exact cent value, so sums
+    # and averages match the float64 source data.
+    return np.round(values.to_numpy(dtype=np.float64), 2)
+
+
+def concat_chunks(chunks):
+    # Joined a column at a time, popping each column off the chunks as it
+    # goes, so the chunks and the result together hold about one copy of
+    # the data. Chunks are categorised independently; give them one shared
+    # set of categories first so the columns stay categorical.
+    chunks = list(chunks)
+    index = chunks[0].index.append([chunk.index for chunk in chunks[1:]])
+    data = {}
+    for col in list(chunks[0].columns):
+        parts = [chunk.pop(col) for chunk in chunks]
+        if col in category_cols:
+            categories = pd.Index([])
+            for part in parts:
+                categories = categories.union(part.cat.categories)
+            parts = [part.cat.set_categories(categories) for part in parts]
+        data[col] = pd.concat(parts, ignore_index=True).array
+        del parts
+    return pd.DataFrame(data, index=index, copy=False)
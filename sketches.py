@@ -0,0 +1,132 @@
+import numpy as np
+
+
+def weighted_quantile(items, weights, q):
+    order = np.argsort(items, kind="stable")
+    items, cum = items[order], np.cumsum(weights[order])
+    if not len(items):
+        return np.nan
+    return items[min(np.searchsorted(cum, q * cum[-1]), len(items) - 1)]
+
+
+class KLLSketch:
+    # Mergeable approximate quantiles (Karnin, Lang & Liberty). Level h holds
+    # items standing for 2**h values each; a level over its capacity is
+    # sorted and every other item, from a random offset, moves up a level.
+    # Rank error is about 1.7 / k of the count, in O(k) memory. Seeded, so
+    # the same input always gives the same sketch; the generator is only
+    # made by the first compaction, as most per-key sketches never need one.
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.zeros(0)]
+        self.seed = seed
+        self.rng = None
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self.capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.zeros(0))
+            if self.rng is None:
+                self.rng = np.random.default_rng(self.seed)
+            items = np.sort(items)
+            odd = len(items) % 2
+            promoted = items[odd:][self.rng.integers(2) :: 2]
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # A new top level lowers every capacity below it; start over.
+            level = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+
+    @classmethod
+    def combine(cls, sketches, k=200):
+        # A lone sketch is returned as is; sketches are not changed once
+        # built, so merged results can share them.
+        sketches = list(sketches)
+        if len(sketches) == 1 and sketches[0].k == k:
+            return sketches[0]
+        merged = cls(k)
+        if not sketches:
+            return merged
+        merged.n = sum(sketch.n for sketch in sketches)
+        depth = max([len(sketch.levels) for sketch in sketches], default=1)
+        merged.levels = [
+            np.concatenate(
+                [sketch.levels[h] for sketch in sketches if h < len(sketch.levels)]
+            )
+            for h in range(depth)
+        ]
+        merged.compress()
+        return merged
+
+    def weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 2.0**h) for h, items in enumerate(self.levels)]
+        )
+        return items, weights
+
+    def quantile(self, q):
+        return weighted_quantile(*self.weighted(), q)
+
+
+class KeyedSketches:
+    # One KLL sketch per measure for every combination of the key columns.
+    # Partials built over separate chunks merge key by key, and any set of
+    # keys merges into a single sketch per measure.
+    def __init__(self, keys, sketches):
+        self.keys = keys
+        self.sketches = sketches
+
+    @classmethod
+    def from_frame(cls, data, keys, values, groups=None):
+        # groups, when given, is data.groupby(keys).indices, computed once
+        # for the sketches and co-moments of the same keys.
+        if groups is None:
+            groups = data.groupby(keys, observed=True).indices
+        sketches = {}
+        for key, rows in groups.items():
+            sketches[key] = {}
+            for name, measure in values.items():
+                sketches[key][name] = KLLSketch()
+                sketches[key][name].update(measure[rows])
+        return cls(keys, sketches)
+
+    @classmethod
+    def combine(cls, parts):
+        # Folded into a copy of the first part's dict, so only the keys a
+        # later part holds are merged and the rest are shared as they are.
+        parts = list(parts)
+        result = dict(parts[0].sketches)
+        for part in parts[1:]:
+            for key, sketches in part.sketches.items():
+                if key in result:
+                    sketches = {
+                        name: KLLSketch.combine([result[key][name], sketch])
+                        for name, sketch in sketches.items()
+                    }
+                result[key] = sketches
+        return cls(parts[0].keys, result)
+
+    def merged(self, keys, names):
+        # names lists the measures, so an empty selection still answers.
+        group = [self.sketches[key] for key in keys]
+        return {
+            name: KLLSketch.combine(sketches[name] for sketches in group)
+            for name in names
+        }
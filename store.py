@@ -0,0 +1,550 @@
+import argparse
+import copy
+import fcntl
+import os
+import pickle
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from cache import (
+    append_frame,
+    is_fresh,
+    load_frame,
+    save_chunks,
+    source_key,
+    CACHE_VERSION,
+)
+from cleaning import (
+    CHUNKSIZE,
+    SOURCE_PATH,
+    ColumnStatistics,
+    OrderIdFilter,
+    add_calendar_columns,
+    clean_chunk,
+    cleaning_settings,
+    read_chunks,
+    read_kept,
+    scan_statistics,
+)
+from correlation import KeyedMoments
+from metrics import stage
+from cube import SalesCube, month_sketch_cols, sketch_cols, sketch_values
+from parallel import TreeMerge, map_chunks, process_pool
+from query import DayIndex, DayIndexes
+from schema import concat_chunks
+from sketches import KeyedSketches
+
+STORE_DIR = os.environ.get("EDA_STORE_DIR", "assets/.store")
+
+# Held while a store is built, reloaded or has deltas ingested, so a rebuild
+# never removes a store an ingest is appending to, and of several processes
+# watching the same source one rebuilds and the others then load it warm.
+LOCK_PATH = STORE_DIR + ".lock"
+
+groupings = {
+    "monthly": ["Year", "Month"],
+    "region_country": ["Region", "Country"],
+    "item_type": ["Item Type"],
+    "sales_channel": ["Sales Channel"],
+    "order_priority": ["Order Priority"],
+}
+
+
+# Order ID bitmap pages: the unit a journal entry records changes in.
+BITMAP_PAGE = 4096
+
+# Journal entries a save adds before it folds them into a new base, so
+# loading never has to merge many of them.
+JOURNAL_LIMIT = 8
+
+
+def save_bitmap(path, bits, page=BITMAP_PAGE):
+    # Only pages holding a set bit are written, so the file stays sparse on
+    # disk when Order IDs are spread over a wide range.
+    tmp = path + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=bits.shape)
+    for start in np.unique(np.flatnonzero(bits) // page) * page:
+        out[start : start + page] = bits[start : start + page]
+    out.flush()
+    del out
+    os.replace(tmp, path)
+
+
+def save_pickle(path, value):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f)
+    os.replace(tmp, path)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def days_file(start, stop):
+    # Each append indexes its own rows, so a day index is named by the run
+    # of frame rows it covers.
+    return f"days-{start}-{stop}.npy"
+
+
+def aggregate_chunk(chunk, stats):
+    # Runs in a pool process: cleaning, and above all date parsing, is the
+    # bulk of the work. The cleaned chunk goes back with its partial cube
+    # and its yearly and monthly sketches and co-moments, so the rows are
+    # written out and aggregated from a single cleaning pass.
+    chunk = add_calendar_columns(clean_chunk(chunk, stats))
+    values = sketch_values(chunk)
+    years = chunk.groupby(sketch_cols, observed=True).indices
+    months = chunk.groupby(month_sketch_cols, observed=True).indices
+    return (
+        chunk,
+        SalesCube.from_frame(chunk),
+        KeyedSketches.from_frame(chunk, sketch_cols, values, years),
+        KeyedMoments.from_frame(chunk, sketch_cols, years),
+        KeyedSketches.from_frame(chunk, month_sketch_cols, values, months),
+        KeyedMoments.from_frame(chunk, month_sketch_cols, months),
+    )
+
+
+def aggregate_range(task, path, stats):
+    return aggregate_chunk(read_kept(task, path), stats)
+
+
+def combine_partials(parts):
+    # parts holds (cube, sketches, moments, month_sketches, month_moments)
+    # tuples; each is merged across the parts.
+    if len(parts) == 1:
+        return tuple(parts[0])
+    cubes, sketches, moments, month_sketches, month_moments = zip(*parts)
+    return (
+        SalesCube.combine(cubes),
+        KeyedSketches.combine(sketches),
+        KeyedMoments.combine(moments),
+        KeyedSketches.combine(month_sketches),
+        KeyedMoments.combine(month_moments),
+    )
+
+
+class AggregateStore:
+    # The sales cube and the cleaned rows it was built from (memory-mapped
+    # from the store directory), plus everything needed to clean later
+    # deltas the same way: the Order ID bitmap for dedup and the
+    # fill/z-score statistics. Rows already accepted are not re-tested when
+    # a delta moves the Total Profit mean/std; only the new rows use the
+    # updated bounds.
+    #
+    # On disk the aggregates are a base pickle plus a journal with an entry
+    # per saved delta holding only that delta's partial aggregates and the
+    # bitmap pages it changed, so saving a delta costs in proportion to the
+    # delta rather than to the history. A small manifest names the current
+    # files; replacing it commits a save.
+    def __init__(
+        self,
+        cube,
+        sketches,
+        moments,
+        month_sketches,
+        month_moments,
+        stats,
+        seen,
+        source=None,
+        settings=None,
+    ):
+        self.cube = cube
+        self.sketches = sketches
+        self.moments = moments
+        self.month_sketches = month_sketches
+        self.month_moments = month_moments
+        self.stats = stats
+        self.seen = seen
+        self.source = source
+        self.settings = settings
+        self.data = None
+        self.layout = None
+        self.days = None
+        # One entry per ingested delta, for keying what is derived from the
+        # store; files are numbered by their count.
+        self.deltas = []
+        # The committed files: base aggregates and bitmap, and the journal.
+        self.base = None
+        self.bits_file = None
+        self.bits_size = None
+        self.journal = []
+        # Cleaned rows, partial aggregates and changed bitmap pages of
+        # ingested deltas, written out by save().
+        self.pending = []
+        self.partials = []
+        self.dirty = set()
+
+    def aggregates(self, root=STORE_DIR):
+        # A store loaded for ingesting only has no aggregates in memory;
+        # they are read back when a save folds the journal into a new base.
+        if self.cube is not None:
+            return (
+                self.cube,
+                self.sketches,
+                self.moments,
+                self.month_sketches,
+                self.month_moments,
+            )
+        base = load_pickle(os.path.join(root, self.base))
+        entries = [
+            load_pickle(os.path.join(root, name))["partials"] for name in self.journal
+        ]
+        return combine_partials([base] + entries + self.partials)
+
+    def ingest(self, chunks, digest=None):
+        # Order IDs are marked in the store's own bitmap, each page copied
+        # before its first change, and the statistics are updated on a copy;
+        # a delta that fails part way puts the pages back, so the store is
+        # left as it was.
+        bits = self.seen.bits
+        seen = OrderIdFilter(bits)
+        stats = copy.deepcopy(self.stats)
+        saved = {}
+        unique = []
+        try:
+            for chunk in chunks:
+                ids = chunk["Order ID"].to_numpy(dtype=np.int64)
+                for page in np.unique((ids[ids >= 0] >> 3) // BITMAP_PAGE):
+                    start = page * BITMAP_PAGE
+                    if page not in saved and start < len(bits):
+                        saved[page] = np.array(bits[start : start + BITMAP_PAGE])
+                chunk = chunk[seen.first_seen(chunk["Order ID"])]
+                stats.update(chunk)
+                unique.append(chunk)
+            parts = list(map_chunks(aggregate_chunk, unique, stats))
+        except BaseException:
+            for page, values in saved.items():
+                bits[page * BITMAP_PAGE : page * BITMAP_PAGE + len(values)] = values
+            raise
+        if parts:
+            delta = combine_partials([partials for _, *partials in parts])
+            self.partials = self.partials + [delta]
+            if self.cube is not None:
+                (
+                    self.cube,
+                    self.sketches,
+                    self.moments,
+                    self.month_sketches,
+                    self.month_moments,
+                ) = combine_partials([self.aggregates(), delta])
+        self.seen, self.stats = seen, stats
+        self.dirty = self.dirty | {int(page) for page in saved}
+        self.pending = self.pending + [chunk for chunk, *_ in parts if len(chunk)]
+        added = sum(len(chunk) for chunk in unique)
+        self.deltas = self.deltas + [{"sha256": digest, "rows": added}]
+        return added
+
+    def table(self, name):
+        return self.cube.rollup(groupings[name])
+
+    def save(self, root=STORE_DIR):
+        # Pending rows are appended past the end of the frame with a day
+        # index over just them, and pending aggregates and bitmap pages go to
+        # a new journal entry, all named by the manifest, so replacing it
+        # commits them at once; a save that fails before that leaves the
+        # previous revision intact. A new store, a journal past
+        # JOURNAL_LIMIT or a bitmap that had to grow gets a new base.
+        os.makedirs(root, exist_ok=True)
+        frame = os.path.join(root, "frame")
+        layout, data, days = self.layout, self.data, self.days
+        if self.pending:
+            layout = append_frame(concat_chunks(self.pending), frame, layout)
+            data = load_frame(frame, layout)
+            start = self.layout["rows"]
+            tail = DayIndex.build(
+                data["Order Date"].iloc[start:],
+                os.path.join(frame, days_file(start, layout["rows"])),
+                first_row=start,
+            )
+            days = DayIndexes(days.parts + [tail])
+        revision = len(self.deltas)
+        base, bits_file, journal = self.base, self.bits_file, self.journal
+        if (
+            base is None
+            or len(self.seen.bits) != self.bits_size
+            or len(journal) + bool(self.partials) > JOURNAL_LIMIT
+        ):
+            base = f"aggregates-{revision}.pkl"
+            save_pickle(os.path.join(root, base), self.aggregates(root))
+            bits_file = f"order_ids-{revision}.npy"
+            save_bitmap(os.path.join(root, bits_file), self.seen.bits)
+            journal = []
+            if len(days.parts) > 1:
+                days = DayIndexes(
+                    [
+                        DayIndex.build(
+                            data["Order Date"],
+                            os.path.join(frame, days_file(0, layout["rows"])),
+                        )
+                    ]
+                )
+        elif self.partials:
+            bits = self.seen.bits
+            pages = {
+                page: np.array(bits[page * BITMAP_PAGE : (page + 1) * BITMAP_PAGE])
+                for page in sorted(self.dirty)
+            }
+            entry = f"delta-{revision}.pkl"
+            save_pickle(
+                os.path.join(root, entry),
+                {"partials": combine_partials(self.partials), "pages": pages},
+            )
+            journal = journal + [entry]
+        state = {
+            "version": CACHE_VERSION,
+            "source": self.source,
+            "settings": self.settings,
+            "deltas": self.deltas,
+            "base": base,
+            "order_ids": bits_file,
+            "journal": journal,
+            "layout": layout,
+            "days": [
+                {
+                    "first_row": part.first_row,
+                    "first": part.first,
+                    "offsets": part.offsets,
+                }
+                for part in days.parts
+            ],
+            "stats": self.stats.__dict__,
+        }
+        save_pickle(os.path.join(root, "manifest.pkl"), state)
+        # The previous revision's files are kept for a reader that loaded
+        # the old manifest just before the replace.
+        files = {base, bits_file, self.base, self.bits_file} | set(
+            journal + self.journal
+        )
+        for name in os.listdir(root):
+            if re.fullmatch(r"(aggregates|delta)-\d+\.pkl|order_ids-\d+\.npy", name):
+                if name not in files:
+                    os.remove(os.path.join(root, name))
+        files = {"index.bin"} | {
+            entry["file"] for entry in layout["columns"] + self.layout["columns"]
+        }
+        for part in days.parts + self.days.parts:
+            files.add(days_file(part.first_row, part.first_row + len(part.order)))
+        for name in os.listdir(frame):
+            if name not in files:
+                os.remove(os.path.join(frame, name))
+        self.layout, self.data, self.days = layout, data, days
+        self.base, self.bits_file, self.journal = base, bits_file, journal
+        self.bits_size = len(self.seen.bits)
+        self.pending, self.partials, self.dirty = [], [], set()
+
+    @classmethod
+    def load(cls, root=STORE_DIR, aggregates=True):
+        # aggregates=False leaves the base aggregates on disk, for a process
+        # that only ingests deltas.
+        state = load_pickle(os.path.join(root, "manifest.pkl"))
+        if state.get("version") != CACHE_VERSION:
+            raise ValueError(f"store in {root} has an old format")
+        stats = ColumnStatistics()
+        stats.__dict__.update(state["stats"])
+        # Mapped copy-on-write: the journal's pages, and the Order IDs of
+        # deltas ingested later, are written to private copies of just the
+        # pages they touch.
+        bits = np.load(os.path.join(root, state["order_ids"]), mmap_mode="c")
+        size = len(bits)
+        entries = []
+        for name in state["journal"]:
+            entry = load_pickle(os.path.join(root, name))
+            for page, values in entry["pages"].items():
+                bits[page * BITMAP_PAGE : page * BITMAP_PAGE + len(values)] = values
+            entries.append(entry["partials"])
+        parts = [None] * 5
+        if aggregates:
+            base = load_pickle(os.path.join(root, state["base"]))
+            parts = combine_partials([base] + entries)
+        store = cls(
+            *parts,
+            stats,
+            OrderIdFilter(bits),
+            state["source"],
+            state["settings"],
+        )
+        store.deltas = state["deltas"]
+        store.base, store.bits_file, store.bits_size = (
+            state["base"],
+            state["order_ids"],
+            size,
+        )
+        store.journal = state["journal"]
+        store.layout = state["layout"]
+        frame = os.path.join(root, "frame")
+        store.data = load_frame(frame, store.layout)
+        store.days = DayIndexes(
+            [
+                DayIndex(
+                    part["first"],
+                    part["offsets"],
+                    np.load(
+                        os.path.join(
+                            frame,
+                            days_file(
+                                part["first_row"],
+                                part["first_row"] + part["offsets"][-1],
+                            ),
+                        ),
+                        mmap_mode="r",
+                    ),
+                    part["first_row"],
+                )
+                for part in state["days"]
+            ]
+        )
+        return store
+
+
+def build_store(
+    path=SOURCE_PATH, root=STORE_DIR, chunksize=CHUNKSIZE, outlier_rules=None
+):
+    # One statistics pass, then one cleaning pass whose chunks are written
+    # to the frame files while their partial aggregates are merged; each
+    # pass parses the file's ranges in the pool, and the partials are merged
+    # there too, as they arrive, so only about log2(chunks) of them wait at
+    # once.
+    seen = OrderIdFilter()
+    tasks = []
+    with process_pool() as pool:
+        with stage("scan_statistics"):
+            stats = scan_statistics(path, chunksize, seen, outlier_rules, tasks, pool)
+        total = TreeMerge(combine_partials, pool)
+
+        def cleaned():
+            for chunk, *partials in map_chunks(
+                aggregate_range, tasks, path, stats, pool=pool
+            ):
+                total.add(partials)
+                yield chunk
+
+        frame = os.path.join(root, "frame")
+        with stage("clean_aggregate"):
+            layout = save_chunks(cleaned(), frame)
+        with stage("combine"):
+            total = total.result()
+    store = AggregateStore(
+        *total,
+        stats,
+        seen,
+        source_key(path),
+        cleaning_settings(outlier_rules),
+    )
+    store.layout = layout
+    store.data = load_frame(frame, layout)
+    with stage("day_index"):
+        store.days = DayIndexes(
+            [
+                DayIndex.build(
+                    store.data["Order Date"],
+                    os.path.join(frame, days_file(0, layout["rows"])),
+                )
+            ]
+        )
+    return store
+
+
+def load_store(
+    path=SOURCE_PATH,
+    root=STORE_DIR,
+    chunksize=CHUNKSIZE,
+    outlier_rules=None,
+    aggregates=True,
+):
+    try:
+        with stage("load_store"):
+            store = AggregateStore.load(root, aggregates)
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, ValueError):
+        store = None
+    meta = store and {
+        "version": CACHE_VERSION,
+        "source": store.source,
+        "settings": store.settings,
+    }
+    if is_fresh(meta, path, cleaning_settings(outlier_rules)):
+        if store.source["mtime_ns"] != os.stat(path).st_mtime_ns:
+            refresh_source(store, path, root)
+        return store
+    shutil.rmtree(root, ignore_errors=True)
+    store = build_store(path, root, chunksize, outlier_rules)
+    with stage("save"):
+        store.save(root)
+    return store
+
+
+# Lock paths held by the current thread: a load_store under a reload or an
+# ingest takes the lock again, and a second flock in one process would wait
+# for itself.
+held_locks = threading.local()
+
+
+@contextmanager
+def store_lock(path=LOCK_PATH):
+    held = held_locks.__dict__.setdefault("paths", set())
+    if path in held:
+        yield
+        return
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+
+
+def refresh_source(store, path, root=STORE_DIR):
+    # The source was touched but its hash still matches: record the new
+    # mtime so later starts do not hash it again. The manifest is only
+    # rewritten while it is still the revision this store was loaded from,
+    # in case another process saved in between.
+    key = source_key(path, store.source["sha256"])
+    try:
+        with store_lock(os.path.normpath(root) + ".lock"):
+            manifest = os.path.join(root, "manifest.pkl")
+            state = load_pickle(manifest)
+            if state["source"] == store.source and state["deltas"] == store.deltas:
+                state["source"] = key
+                save_pickle(manifest, state)
+    except OSError:
+        # A read-only store still serves; the next start hashes again.
+        pass
+    store.source = key
+
+
+def ingest_delta(
+    delta_path,
+    path=SOURCE_PATH,
+    root=STORE_DIR,
+    chunksize=CHUNKSIZE,
+    outlier_rules=None,
+):
+    # A rebuild for a changed source starts over from the source alone, so
+    # deltas ingested before it are dropped with the old store.
+    with store_lock(os.path.normpath(root) + ".lock"):
+        store = load_store(path, root, chunksize, outlier_rules, aggregates=False)
+        added = store.ingest(
+            read_chunks(delta_path, chunksize), source_key(delta_path)["sha256"]
+        )
+        store.save(root)
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append new orders to the persisted aggregate store."
+    )
+    parser.add_argument("deltas", nargs="+", help="CSV files with new orders")
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+    for delta in args.deltas:
+        added = ingest_delta(delta, args.source, args.store)
+        print(f"{delta}: {added:,} new orders")
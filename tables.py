@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from dash import dash_table
+from dash.dash_table.Format import Format, Scheme
+
+operators = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+# searchsorted side for each comparison: rows in sorted[lo:hi] match.
+comparisons = {
+    "eq": ("left", "right"),
+    "ge": ("left", None),
+    "gt": ("right", None),
+    "le": (None, "right"),
+    "lt": (None, "left"),
+}
+
+
+def split_filter_part(filter_part):
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find("{") + 1 : name_part.rfind("}")]
+                value_part = value_part.strip()
+                v0 = value_part[:1]
+                op = operator_type[0].strip()
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                    value = value_part[1:-1].replace("\\" + v0, v0)
+                elif op in comparisons or op == "ne":
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                else:
+                    value = value_part
+                return name, op, value
+    return [None] * 3
+
+
+class IndexedTable:
+    # Backing store for a server-side DataTable. Each column gets a stable
+    # argsort the first time it is sorted or range-filtered on, so a page
+    # request is a few searchsorted calls plus a slice of at most page_size
+    # rows instead of shipping the whole frame to the browser.
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        self.orders = {}
+        self.sorted_values = {}
+
+    def columns(self):
+        columns = []
+        for col in self.frame.columns:
+            column = {"name": col, "id": col}
+            if pd.api.types.is_numeric_dtype(self.frame[col]):
+                column["type"] = "numeric"
+                if pd.api.types.is_float_dtype(self.frame[col]):
+                    column["format"] = Format(precision=2, scheme=Scheme.fixed)
+            columns.append(column)
+        return columns
+
+    def order(self, col):
+        if col not in self.orders:
+            values = self.frame[col].to_numpy()
+            order = np.argsort(values, kind="stable")
+            self.orders[col] = order
+            self.sorted_values[col] = values[order]
+        return self.orders[col]
+
+    def match(self, col, op, value):
+        values = self.frame[col]
+        if op in ("contains", "datestartswith"):
+            return values.astype(str).str.contains(str(value), regex=False).to_numpy()
+        if op == "ne":
+            return (values != value).to_numpy()
+        mask = np.zeros(len(values), dtype=bool)
+        order = self.order(col)
+        try:
+            value = np.array(value).astype(self.sorted_values[col].dtype)
+            lo_side, hi_side = comparisons[op]
+            lo = (
+                0
+                if lo_side is None
+                else np.searchsorted(self.sorted_values[col], value, lo_side)
+            )
+            hi = (
+                len(order)
+                if hi_side is None
+                else np.searchsorted(self.sorted_values[col], value, hi_side)
+            )
+        except (TypeError, ValueError):
+            return mask
+        mask[order[lo:hi]] = True
+        return mask
+
+    def select(self, filter_query):
+        mask = None
+        for filter_part in (filter_query or "").split(" && "):
+            col, op, value = split_filter_part(filter_part)
+            if col not in self.frame.columns:
+                continue
+            part = self.match(col, op, value)
+            mask = part if mask is None else mask & part
+        return mask
+
+    def page(self, page_current, page_size, sort_by=None, filter_query=""):
+        mask = self.select(filter_query)
+        if sort_by:
+            rows = self.order(sort_by[0]["column_id"])
+            if sort_by[0]["direction"] == "desc":
+                rows = rows[::-1]
+            if mask is not None:
+                rows = rows[mask[rows]]
+        elif mask is not None:
+            rows = np.flatnonzero(mask)
+        else:
+            rows = np.arange(len(self.frame))
+
+        if sort_by and len(sort_by) > 1:
+            # Multi-column sorts fall back to sorting the selected rows.
+            subset = self.frame.iloc[rows].sort_values(
+                [s["column_id"] for s in sort_by],
+                ascending=[s["direction"] == "asc" for s in sort_by],
+                kind="stable",
+            )
+            rows = subset.index.to_numpy()
+
+        start = page_current * page_size
+        page = self.frame.iloc[rows[start : start + page_size]]
+        page_count = max(1, -(-len(rows) // page_size))
+        return page.to_dict("records"), page_count
+
+
+def paged_table(table_id, table, page_size=100, **kwargs):
+    return dash_table.DataTable(
+        id=table_id,
+        columns=table.columns(),
+        page_current=0,
+        page_size=page_size,
+        page_action="custom",
+        sort_action="custom",
+        sort_mode="multi",
+        sort_by=[],
+        filter_action="custom",
+        filter_query="",
+        **kwargs,
+    )
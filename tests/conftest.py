@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench import generate_dataset  # noqa: E402
+from store import load_store  # noqa: E402
+
+ROWS = 5000
+
+
+@pytest.fixture(scope="session")
+def store(tmp_path_factory):
+    # A store over synthetic orders, built in small chunks so its
+    # aggregates are merged from many partials.
+    workdir = tmp_path_factory.mktemp("store")
+    path = str(workdir / "orders.csv")
+    generate_dataset(
+        ROWS, path, template=os.path.join(ROOT, "assets/cleaned_dataset.csv")
+    )
+    return load_store(path, str(workdir / "store"), chunksize=700)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import OrderIdFilter
+
+
+def test_first_seen_across_chunks():
+    rng = np.random.default_rng(0)
+    ids = pd.Series(rng.integers(100_000_000, 100_050_000, 20_000))
+    seen = OrderIdFilter()
+    kept = np.concatenate(
+        [
+            seen.first_seen(ids.iloc[start : start + 1_500])
+            for start in range(0, len(ids), 1_500)
+        ]
+    )
+    assert np.array_equal(kept, ~ids.duplicated().to_numpy())
+
+    # A later chunk, like an ingested delta, only keeps IDs never seen.
+    later = pd.Series([100_000_000 - 1, ids.iloc[0], 100_050_000, 100_050_000])
+    fresh = ~later.isin(ids).to_numpy() & ~later.duplicated().to_numpy()
+    assert np.array_equal(seen.first_seen(later), fresh)
+
+
+def test_first_seen_empty_and_negative():
+    seen = OrderIdFilter()
+    assert len(seen.first_seen(pd.Series([], dtype=np.int64))) == 0
+    with pytest.raises(ValueError):
+        seen.first_seen(pd.Series([5, -1]))
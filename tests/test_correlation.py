@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from correlation import CoMoments, KeyedMoments, correlation
+
+
+def sample(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=rows)
+    block = np.column_stack(
+        [
+            x,
+            2 * x + rng.normal(size=rows),
+            rng.normal(size=rows),
+            # Nearly constant, where raw sums of squares lose the variance.
+            1e6 + rng.normal(scale=1e-2, size=rows),
+        ]
+    )
+    block[rng.random(block.shape) < 0.1] = np.nan
+    return block
+
+
+def close(got, expected):
+    # Co-moments compared relative to sqrt(m2[i] * m2[j]), the scale of each
+    # pair, rather than entry by entry; a constant column only holds
+    # rounding noise.
+    scale = np.sqrt(np.abs(np.outer(np.diag(expected), np.diag(expected))))
+    return np.all(np.abs(got - expected) <= 1e-7 * scale + 1e-6)
+
+
+def direct(block):
+    # Pairwise-complete statistics of each column pair, computed directly.
+    k = block.shape[1]
+    n, m2 = np.zeros((k, k)), np.zeros((k, k))
+    for i in range(k):
+        for j in range(k):
+            rows = ~np.isnan(block[:, i]) & ~np.isnan(block[:, j])
+            n[i, j] = rows.sum()
+            m2[i, j] = ((block[rows, i] - block[rows, i].mean()) ** 2).sum()
+    return n, m2
+
+
+def test_merge_matches_direct():
+    block = sample(5_000)
+    columns = list("abcd")
+    parts = [
+        CoMoments.from_block(columns, block[start:stop])
+        for start, stop in [(0, 1), (1, 1), (1, 700), (700, 3_000), (3_000, 5_000)]
+    ]
+    whole = CoMoments.from_block(columns, block)
+    for merged in [
+        CoMoments.combine(parts),
+        parts[0].merge(parts[1]).merge(CoMoments.combine(parts[2:])),
+    ]:
+        n, m2 = direct(block)
+        assert np.array_equal(merged.n, n)
+        assert np.allclose(merged.m2, m2, rtol=1e-9)
+        assert np.allclose(merged.mean, whole.mean, rtol=1e-12)
+        assert close(merged.cxy, whole.cxy)
+        reference = pd.DataFrame(block, columns=columns).corr()
+        assert np.allclose(merged.corr().to_numpy(), reference.to_numpy(), atol=1e-7)
+
+
+def test_correlation_matches_pandas():
+    data = pd.DataFrame(sample(10_000, seed=1), columns=list("abcd"))
+    assert np.allclose(
+        correlation(data, block_rows=999).to_numpy(), data.corr().to_numpy(), atol=1e-7
+    )
+
+
+def test_combine_empty_and_columns():
+    columns = list("ab")
+    empty = CoMoments.combine([], columns)
+    assert empty.columns == columns and not empty.n.any()
+    part = CoMoments.from_block(columns, sample(10)[:, :2])
+    assert CoMoments.combine([part]) is part
+
+
+def test_keyed_combine():
+    rng = np.random.default_rng(2)
+    data = pd.DataFrame(
+        {
+            "Key": rng.integers(0, 5, 2_000),
+            "x": rng.normal(size=2_000),
+            "y": rng.normal(size=2_000),
+        }
+    )
+    parts = [
+        KeyedMoments.from_frame(data.iloc[start : start + 300], ["Key"])
+        for start in range(0, len(data), 300)
+    ]
+    combined = KeyedMoments.combine(parts)
+    whole = KeyedMoments.from_frame(data, ["Key"])
+    assert combined.moments.keys() == whole.moments.keys()
+    for key in whole.moments:
+        assert np.allclose(combined.moments[key].m2, whole.moments[key].m2)
+        assert close(combined.moments[key].cxy, whole.moments[key].cxy)
+    keys = [1, 3]
+    subset = data[data["Key"].isin(keys)][combined.columns]
+    assert np.allclose(
+        combined.merged(keys).corr().to_numpy(), subset.corr().to_numpy(), atol=1e-9
+    )
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import SalesCube, measure_cols, measure_values, sketch_values
+from query import (
+    DayIndex,
+    DayIndexes,
+    SalesQuery,
+    day_number,
+    month_of,
+    month_start,
+    whole_periods,
+    year_of,
+    year_start,
+)
+
+cases = [
+    ({}, None, None),
+    ({"Region": ["Europe"]}, None, None),
+    ({"Item Type": ["Cosmetics", "Clothes"], "Sales Channel": ["Online"]}, None, None),
+    ({}, "2012-03-15", "2015-07-09"),
+    ({"Region": ["Asia", "Europe"]}, "2013-02-01", "2013-02-28"),
+    ({"Sales Channel": ["Offline"]}, "2014-05-03", "2014-05-20"),
+    ({}, "2016-01-10", None),
+    ({"Item Type": ["Fruits"]}, None, "2011-12-31T00:00:00"),
+    ({"Region": ["Nowhere"]}, None, None),
+    ({}, "2015-01-01", "2014-01-01"),
+]
+
+
+def masked(data, filters, start, end):
+    mask = np.ones(len(data), dtype=bool)
+    for col, values in filters.items():
+        mask &= data[col].isin(values).to_numpy()
+    days = data["Order Date"].to_numpy().astype(np.int64)
+    if start is not None:
+        mask &= days >= day_number(start)
+    if end is not None:
+        mask &= days <= day_number(end)
+    return data[mask]
+
+
+@pytest.mark.parametrize("filters, start, end", cases)
+def test_slice_totals(store, filters, start, end):
+    got = SalesQuery(store).slice(filters, start, end)
+    expected = masked(store.data, filters, start, end)
+    totals = got.totals()
+    values = measure_values(expected)
+    for col in measure_cols:
+        assert totals[col] == pytest.approx(values[col].sum())
+    if len(expected):
+        monthly = got.rollup(["Year", "Month"])
+        reference = SalesCube.from_frame(expected).rollup(["Year", "Month"])
+        assert np.allclose(monthly.to_numpy(float), reference.to_numpy(float))
+
+
+@pytest.mark.parametrize("filters, start, end", cases)
+def test_correlation(store, filters, start, end):
+    got = SalesQuery(store).correlation(filters, start, end)
+    expected = masked(store.data, filters, start, end)[got.columns]
+    expected = expected.astype(np.float64)
+    reference = expected.corr()
+    # Profit Margin is constant per item type; its correlations within one
+    # are of rounding noise on either side.
+    varies = (expected.std() > 1e-9 * (expected.mean().abs() + 1)).to_numpy()
+    pairs = np.outer(varies, varies)
+    assert np.allclose(
+        got.to_numpy()[pairs], reference.to_numpy()[pairs], atol=1e-9, equal_nan=True
+    )
+
+
+@pytest.mark.parametrize("filters, start, end", cases[:7])
+def test_quantiles(store, filters, start, end):
+    got = SalesQuery(store).quantiles(filters, start, end)
+    values = sketch_values(masked(store.data, filters, start, end))
+    for name, sketch in got.items():
+        column = np.sort(values[name][~np.isnan(values[name])])
+        assert sketch.n == len(column)
+        # The answer's rank range (several values can tie) must come within
+        # the sketch's rank error of q.
+        error = 0.05 + 1 / len(column)
+        for q in (0.1, 0.5, 0.9):
+            answer = sketch.quantile(q)
+            assert (
+                np.searchsorted(column, answer, side="left") / len(column) <= q + error
+            )
+            assert (
+                np.searchsorted(column, answer, side="right") / len(column) >= q - error
+            )
+
+
+def test_whole_periods():
+    day = day_number
+    months, edges = whole_periods(
+        day("2013-02-15"), day("2013-05-10"), month_of, month_start
+    )
+    assert months == (month_of(day("2013-03-01")), month_of(day("2013-04-01")))
+    assert edges == [
+        (day("2013-02-15"), day("2013-02-28")),
+        (day("2013-05-01"), day("2013-05-10")),
+    ]
+
+    # Ranges on period boundaries leave empty edges.
+    months, edges = whole_periods(
+        day("2013-03-01"), day("2013-03-31"), month_of, month_start
+    )
+    assert months == (month_of(day("2013-03-01")),) * 2
+    assert [lo > hi for lo, hi in edges] == [True, True]
+
+    # Not one whole period fits.
+    assert whole_periods(
+        day("2013-03-02"), day("2013-03-30"), month_of, month_start
+    ) == (
+        None,
+        [(day("2013-03-02"), day("2013-03-30"))],
+    )
+
+    # Open ends.
+    years, edges = whole_periods(None, day("2014-06-30"), year_of, year_start)
+    assert years == (None, 2013)
+    assert edges == [(day("2014-01-01"), day("2014-06-30"))]
+    years, edges = whole_periods(day("2014-06-30"), None, year_of, year_start)
+    assert years == (2015, None)
+    assert edges == [(day("2014-06-30"), day("2014-12-31"))]
+
+
+def test_day_index_between(tmp_path):
+    rng = np.random.default_rng(0)
+    days = pd.Series(rng.integers(15000, 15100, 1000).astype(np.int32))
+    index = DayIndex.build(days, str(tmp_path / "days.npy"), block_rows=64)
+    values = days.to_numpy()
+    for lo, hi in [
+        (None, None),
+        (15020, 15040),
+        (14000, 15010),
+        (15090, 16000),
+        (15050, 15049),
+        (None, 15000),
+        (15099, None),
+    ]:
+        expected = np.flatnonzero(
+            (values >= (lo if lo is not None else values.min()))
+            & (values <= (hi if hi is not None else values.max()))
+        )
+        assert np.array_equal(index.between(lo, hi), expected)
+
+
+def test_day_indexes_between(tmp_path):
+    rng = np.random.default_rng(1)
+    days = pd.Series(rng.integers(15000, 15100, 900).astype(np.int32))
+    parts = DayIndexes(
+        [
+            DayIndex.build(
+                days.iloc[start:stop],
+                str(tmp_path / f"days-{start}.npy"),
+                first_row=start,
+            )
+            for start, stop in [(0, 500), (500, 850), (850, 900)]
+        ]
+    )
+    values = days.to_numpy()
+    for lo, hi in [(None, None), (15010, 15030), (15099, 15099), (16000, None)]:
+        mask = np.ones(len(values), dtype=bool)
+        if lo is not None:
+            mask &= values >= lo
+        if hi is not None:
+            mask &= values <= hi
+        assert np.array_equal(parts.between(lo, hi), np.flatnonzero(mask))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from sketches import KLLSketch
+
+
+def rank_error(sketch, values):
+    # The largest distance, as a fraction of the count, between q and the
+    # rank of the sketch's q-quantile.
+    values = np.sort(values)
+    return max(
+        abs(np.searchsorted(values, sketch.quantile(q), side="right") / len(values) - q)
+        for q in np.linspace(0.01, 0.99, 99)
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rank_error(seed):
+    values = np.random.default_rng(seed).lognormal(size=200_000)
+    sketch = KLLSketch()
+    for start in range(0, len(values), 5_000):
+        sketch.update(values[start : start + 5_000])
+    assert sketch.n == len(values)
+    assert sum(len(level) for level in sketch.levels) < 1_000
+    assert rank_error(sketch, values) < 0.02
+
+
+def test_combine_rank_error():
+    rng = np.random.default_rng(3)
+    parts = [rng.normal(loc, size=rng.integers(1, 20_000)) for loc in range(40)]
+    sketches = []
+    for part in parts:
+        sketches.append(KLLSketch())
+        sketches[-1].update(part)
+    merged = KLLSketch.combine(sketches)
+    values = np.concatenate(parts)
+    assert merged.n == len(values)
+    assert rank_error(merged, values) < 0.02
+
+
+def test_exact_below_capacity():
+    values = np.random.default_rng(4).permutation(100).astype(float)
+    sketch = KLLSketch()
+    sketch.update(np.concatenate([values, [np.nan]]))
+    assert sketch.n == 100
+    assert [sketch.quantile(q) for q in (0, 0.5, 1)] == [0, 49, 99]
+
+
+def test_combine_edge_cases():
+    sketch = KLLSketch()
+    sketch.update([1.0, 2.0])
+    assert KLLSketch.combine([sketch]) is sketch
+    empty = KLLSketch.combine([])
+    assert empty.n == 0 and np.isnan(empty.quantile(0.5))
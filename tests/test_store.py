@@ -0,0 +1,51 @@
+import numpy as np
+
+from correlation import KeyedMoments
+from cube import (
+    SalesCube,
+    dimension_cols,
+    measure_cols,
+    month_sketch_cols,
+    sketch_cols,
+    sketch_values,
+)
+from sketches import KeyedSketches
+from test_correlation import close
+
+
+def test_combined_partials_match_direct(store):
+    # The store's aggregates were merged from many chunk partials; they must
+    # match aggregates computed over the cleaned rows in one go.
+    data = store.data
+    cells = store.cube.cells.sort_values(dimension_cols).reset_index(drop=True)
+    expected = (
+        SalesCube.from_frame(data)
+        .cells.sort_values(dimension_cols)
+        .reset_index(drop=True)
+    )
+    assert len(cells) == len(expected)
+    assert (
+        (cells[dimension_cols].astype(str) == expected[dimension_cols].astype(str))
+        .all()
+        .all()
+    )
+    assert np.allclose(
+        cells[measure_cols].to_numpy(float), expected[measure_cols].to_numpy(float)
+    )
+
+    moments = KeyedMoments.from_frame(data, sketch_cols)
+    assert store.moments.moments.keys() == moments.moments.keys()
+    for key, part in moments.moments.items():
+        assert np.array_equal(store.moments.moments[key].n, part.n)
+        assert np.allclose(store.moments.moments[key].m2, part.m2)
+        assert close(store.moments.moments[key].cxy, part.cxy)
+
+    sketches = KeyedSketches.from_frame(data, month_sketch_cols, sketch_values(data))
+    assert store.month_sketches.sketches.keys() == sketches.sketches.keys()
+    for key, part in sketches.sketches.items():
+        for name, sketch in part.items():
+            assert store.month_sketches.sketches[key][name].n == sketch.n
+
+
+def test_order_ids_unique(store):
+    assert not store.data["Order ID"].duplicated().any()
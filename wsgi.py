@@ -0,0 +1,7 @@
+from eda import app
+
+# WSGI entry point for production serving, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:server
+# Importing eda loads the cached, memory-mapped dataset and the aggregate
+# store; with preload_app the master does this once before forking.
+server = app.server